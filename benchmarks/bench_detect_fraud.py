@@ -0,0 +1,123 @@
+# benchmarks/bench_detect_fraud.py
+#
+# Times scripts/detect_fraud.py on synthetic batches of 10^5, 10^6 and 10^7 rows and
+# compares it with the original groupby/apply implementation of Rapid Fire and New Location.
+#
+#   python benchmarks/bench_detect_fraud.py
+#   python benchmarks/bench_detect_fraud.py --sizes 100000 1000000 --legacy-max-rows 1000000
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import detect_fraud  # noqa: E402
+
+TYPES = ["Purchase", "Withdrawal", "Transfer", "Fare", "Deposit"]
+CHANNELS = ["POS", "ATM", "Online", "App"]
+LOCATIONS = [
+    "Rosebank, GP", "Mowbray, WC", "Umhlanga, KZN", "Polokwane, LP",
+    "Kimberley, NC", "Gqeberha, EC", "Potchefstroom, NW", "Mbombela, MP"
+]
+MERCHANTS = ["Shoprite", "Woolworths", "Gautrain", "Takealot", "KFC", "FNB ATM"]
+
+
+def make_transactions(n, txns_per_user=40, seed=0):
+    """Synthetic transactions shaped like transactions.csv, with ~txns_per_user rows per user over 60 days."""
+    rng = np.random.default_rng(seed)
+    n_users = max(1, n // txns_per_user)
+    seconds = rng.integers(0, 60 * 86400, n)
+    # Bunch some txns together so Rapid Fire has something to find
+    burst = rng.random(n) < 0.05
+    seconds[burst] = seconds[burst] // 600 * 600 + rng.integers(0, 120, burst.sum())
+    balance = np.round(rng.uniform(-1000, 100000, n), 2)
+    amount = np.round(rng.uniform(20, 5000, n), 2)
+    large = rng.random(n) < 0.005
+    amount[large] = np.round(rng.uniform(55000, 150000, large.sum()), 2)
+    return pd.DataFrame({
+        "transaction_id": np.arange(20000, 20000 + n),
+        "user_id": rng.integers(1001, 1001 + n_users, n),
+        "timestamp": np.datetime64("2025-05-01") + seconds.astype("timedelta64[s]"),
+        "amount": amount,
+        "type": np.array(TYPES, dtype=object)[rng.integers(0, len(TYPES), n)],
+        "channel": np.array(CHANNELS, dtype=object)[rng.integers(0, len(CHANNELS), n)],
+        "location": np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+        "merchant": np.array(MERCHANTS, dtype=object)[rng.integers(0, len(MERCHANTS), n)],
+        "balance_before_txn": balance,
+        "balance_after_txn": balance - amount,
+    })
+
+
+# --- Original per-row implementations, kept here as the baseline ---
+def legacy_rapid_fire(group):
+    mask = pd.Series(False, index=group.index)
+    for i in range(len(group)):
+        if i >= 2:
+            delta = group.iloc[i]["timestamp"] - group.iloc[i-2]["timestamp"]
+            if delta.total_seconds() <= 300:
+                mask.iloc[i] = True
+                mask.iloc[i-1] = True
+                mask.iloc[i-2] = True
+    return mask
+
+
+def legacy_new_loc(group):
+    mask = pd.Series(False, index=group.index)
+    for i in range(len(group)):
+        current = group.iloc[i]
+        lookback = group[(group["timestamp"] < current["timestamp"]) &
+                         (group["timestamp"] >= current["timestamp"] - timedelta(days=30))]
+        locations = set(lookback["location"].dropna())
+        if current["location"] not in locations:
+            mask.iloc[i] = True
+    return mask
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(n, legacy_max_rows):
+    df = make_transactions(n)
+    flagged, total = timed(detect_fraud.detect_fraud, df.copy())
+    # Shallow copies, so each rule builds its own window index instead of reusing detect_fraud()'s
+    rf, rf_time = timed(detect_fraud.rapid_fire_mask, flagged.copy(deep=False))
+    nl, nl_time = timed(detect_fraud.new_location_mask, flagged.copy(deep=False))
+    row = {"rows": n, "detect_fraud_s": total, "rapid_fire_s": rf_time, "new_location_s": nl_time}
+
+    if n <= legacy_max_rows:
+        grouped = flagged[["user_id", "timestamp", "location"]].groupby("user_id", group_keys=False)
+        legacy_rf, legacy_rf_time = timed(grouped.apply, legacy_rapid_fire)
+        legacy_nl, legacy_nl_time = timed(grouped.apply, legacy_new_loc)
+        assert legacy_rf.sort_index().equals(rf), "Rapid Fire flags differ from the legacy implementation"
+        assert legacy_nl.sort_index().equals(nl), "New Location flags differ from the legacy implementation"
+        row["legacy_rules_s"] = legacy_rf_time + legacy_nl_time
+        row["rules_speedup"] = row["legacy_rules_s"] / (rf_time + nl_time)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fraud detection rule engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6, 10**7])
+    parser.add_argument("--legacy-max-rows", type=int, default=10**5,
+                        help="Only time the legacy loops up to this many rows (they are O(n^2) per user).")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'detect_fraud':>13} {'rapid_fire':>11} {'new_location':>13} {'legacy rules':>13} {'speedup':>8}")
+    for n in args.sizes:
+        row = bench(n, args.legacy_max_rows)
+        legacy = f"{row['legacy_rules_s']:12.2f}s" if "legacy_rules_s" in row else f"{'skipped':>13}"
+        speedup = f"{row['rules_speedup']:7.0f}x" if "rules_speedup" in row else f"{'-':>8}"
+        print(f"{n:>10} {row['detect_fraud_s']:12.2f}s {row['rapid_fire_s']:10.2f}s "
+              f"{row['new_location_s']:12.2f}s {legacy} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+# benchmarks/run_benchmarks.py
+#
+# Benchmark and regression suite for the whole pipeline:
+#   - generation: scripts/generate_users.py + generate_transactions.py at several sizes
+#   - detection: every rule in scripts/detect_fraud.py on its own, and the full pass
+#   - loading: scripts/load_to_postgres.py rows/s into a separate benchmark database
+#   - API: latency percentiles and requests/s of /transactions, /fraud-transactions, /users
+#   - correctness: flags identical across the serial, parallel, streaming, incremental
+#     and legacy per-row implementations, and unchanged against the baseline; a month
+#     detached by the retention policy loads again cleanly
+#
+# Results are written as JSON. --compare fails (exit code 1) when a metric is worse than
+# the baseline by more than --tolerance, or when the flags changed.
+#
+#   python benchmarks/run_benchmarks.py --save-baseline
+#   python benchmarks/run_benchmarks.py --compare
+#   python benchmarks/run_benchmarks.py --users 100 1000 --skip-db --compare --tolerance 0.5
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+import detect_fraud  # noqa: E402
+from bench_detect_fraud import legacy_new_loc, legacy_rapid_fire, make_transactions  # noqa: E402
+from pipeline_io import read_frame, write_frame  # noqa: E402
+
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+BENCH_DB = os.getenv("BENCH_POSTGRES_DB", "fnb_fraud_bench")  # never the real database: loading replaces its rows
+ENDPOINTS = ["/transactions?limit=100", "/fraud-transactions", "/users"]
+NOISE_FLOOR_S = 0.05  # timings below this on both sides are never reported as regressions
+CORRECTNESS_ROWS = 20_000  # rows of the seeded frame the implementations are compared on
+LEGACY_MAX_ROWS = 2_000    # the legacy loops are O(n^2) per user
+
+
+class Results:
+    """Named metrics, each with the direction that counts as better."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.notes = []
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(float(value), 6), "unit": unit, "better": better}
+        shown = f"{value:,.0f}" if unit.endswith("/s") else f"{value:.4f}"
+        print(f"  {name:<60} {shown:>14} {unit}")
+
+    def skip(self, section, reason):
+        self.notes.append(f"{section} skipped: {reason}")
+        print(f"  ⏭️ {section} skipped: {reason}")
+
+
+def best_of(repeat, fn, *args):
+    """(result of the last call, fastest wall time) over `repeat` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+# --- Generation and detection ---
+def bench_generation(results, n_users, repeat):
+    """Generates n_users users and their transactions in the working directory; returns the frames."""
+    from generate_transactions import generate_transactions
+    from generate_users import generate_users
+
+    random.seed(n_users)
+    with contextlib.redirect_stdout(io.StringIO()):
+        users, seconds = best_of(repeat, generate_users, n_users)
+        transactions, txn_seconds = best_of(1, lambda: generate_transactions(users_df=users))  # the slow one
+    results.add(f"generate.users_{n_users}.seconds", seconds, "s")
+    results.add(f"generate.transactions_{n_users}.rows_per_second", len(transactions) / txn_seconds, "rows/s",
+                better="higher")
+    return users, transactions
+
+
+def bench_detection(results, transactions, label, repeat):
+    """Times the full detection pass and every registered rule on its own."""
+    flagged, seconds = best_of(repeat, lambda: detect_fraud.detect_fraud(transactions.copy()))
+    results.add(f"detect.{label}.full_pass.seconds", seconds, "s")
+    results.add(f"detect.{label}.full_pass.rows_per_second", len(flagged) / seconds, "rows/s", better="higher")
+    for rule in detect_fraud.RULES:
+        # A fresh frame object per rule, so window rules pay for building their own index
+        _, seconds = best_of(repeat, lambda: detect_fraud.evaluate_rules(flagged.copy(deep=False), [rule]))
+        results.add(f"detect.{label}.rule.{rule.name.lower().replace(' ', '_')}.seconds", seconds, "s")
+    return flagged
+
+
+# --- Correctness ---
+def flag_columns(df):
+    """transaction_id -> (rules_mask, fraud_score, is_fraud), the part of the output every implementation must agree on."""
+    columns = df[["transaction_id", "rules_mask", "fraud_score", "is_fraud"]].astype("int64")
+    return columns.sort_values("transaction_id").reset_index(drop=True)
+
+
+def flags_digest(flags):
+    return hashlib.sha256(pd.util.hash_pandas_object(flags, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def check_correctness(workdir):
+    """Runs every detection implementation on one seeded frame and compares their flags."""
+    df = make_transactions(CORRECTNESS_ROWS, seed=17)
+    expected = flag_columns(detect_fraud.detect_fraud(df.copy()))
+    checks = {}
+
+    checks["parallel"] = flag_columns(detect_fraud.detect_fraud_parallel(df.copy(), workers=2)).equals(expected)
+
+    sorted_path, streamed_path = os.path.join(workdir, "sorted.csv"), os.path.join(workdir, "streamed.csv")
+    write_frame(df.sort_values(["user_id", "timestamp"], kind="stable"), sorted_path)
+    # Profiles of this frame go to their own files, so bench_load() never loads them
+    profiles_path = os.path.join(workdir, "profiles.parquet")
+    detect_fraud.detect_fraud_streaming(sorted_path, streamed_path, chunksize=CORRECTNESS_ROWS // 7,
+                                        profiles_path=profiles_path)
+    checks["streaming"] = flag_columns(read_frame(streamed_path)).equals(expected)
+
+    state_path = os.path.join(workdir, "state.csv")
+    cutoff = df["timestamp"].quantile(0.6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = detect_fraud.detect_fraud_incremental(df[df["timestamp"] <= cutoff].copy(), state_path, profiles_path)
+        second = detect_fraud.detect_fraud_incremental(df.copy(), state_path, profiles_path)
+    incremental = pd.concat([first, second]).drop_duplicates("transaction_id", keep="last")
+    checks["incremental"] = flag_columns(incremental).equals(expected)
+
+    small = detect_fraud.detect_fraud(df[df["user_id"] < df["user_id"].min() + LEGACY_MAX_ROWS // 40].copy())
+    grouped = small[["user_id", "timestamp", "location"]].groupby("user_id", group_keys=False)
+    checks["legacy_rapid_fire"] = grouped.apply(legacy_rapid_fire).sort_index().equals(
+        detect_fraud.rapid_fire_mask(small))
+    checks["legacy_new_location"] = grouped.apply(legacy_new_loc).sort_index().equals(
+        detect_fraud.new_location_mask(small))
+
+    for name, identical in checks.items():
+        print(f"  {name:<60} {'identical' if identical else 'DIFFERENT':>14}")
+    return {"checks": checks, "flags_digest": flags_digest(expected), "rows": CORRECTNESS_ROWS}
+
+
+# --- Loading ---
+def bench_database_url():
+    from sqlalchemy.engine import make_url
+    from load_to_postgres import DATABASE_URL
+    return make_url(DATABASE_URL).set(database=BENCH_DB)
+
+
+def prepare_bench_database():
+    """Creates the benchmark database and its tables if needed. Raises if Postgres is unreachable."""
+    from sqlalchemy import create_engine, text
+    from partitions import ensure_schema
+
+    url = bench_database_url()
+    server = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with server.connect() as conn:
+        if not conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :db"), {"db": BENCH_DB}).first():
+            conn.execute(text(f'CREATE DATABASE "{BENCH_DB}"'))
+    server.dispose()
+
+    engine = create_engine(url)
+    ensure_schema(engine)
+    return engine
+
+
+def bench_load(results, engine, label, users, flagged):
+    """Loads the users, flagged transactions and profiles files in the working directory into the benchmark database."""
+    from sqlalchemy import text
+    from load_to_postgres import load_data_to_postgres
+    from user_profiles import UserProfiles
+
+    detect_fraud.export(flagged)
+    UserProfiles.from_transactions(flagged).save()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        load_data_to_postgres()
+    seconds = time.perf_counter() - start
+    with engine.connect() as conn:
+        loaded = conn.execute(text("SELECT count(*) FROM transactions")).scalar()
+    if loaded != len(flagged) or "❌" in log.getvalue():  # the loader reports errors instead of raising
+        raise RuntimeError(f"loaded {loaded} of {len(flagged)} transactions:\n{log.getvalue()}")
+    results.add(f"load.{label}.rows_per_second", (len(users) + len(flagged)) / seconds, "rows/s", better="higher")
+
+
+def check_retention_reload(engine, flagged):
+    """Detaches the oldest month, then reloads the same files, with a full reload and with --upsert.
+
+    The month has to come back in full each time, next to its detached copies.
+    """
+    from sqlalchemy import text
+    from load_to_postgres import load_data_to_postgres
+    from partitions import add_months, apply_retention, attached_partitions
+
+    identical = True
+    for upsert in (False, True):
+        with engine.begin() as conn:
+            oldest = min(month for month, name in attached_partitions(conn).items()
+                         if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar())
+            # As if it were two months later, with one full month kept: only the oldest month expires.
+            # A different day each time, so the detached copies get different names.
+            detached = apply_retention(conn, 1, "detach", today=add_months(oldest, 2).replace(day=1 + upsert))
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            load_data_to_postgres(upsert=upsert)
+        with engine.connect() as conn:
+            loaded = conn.execute(text("SELECT count(*) FROM transactions")).scalar()
+        identical &= len(detached) == 1 and loaded == len(flagged) and "❌" not in log.getvalue()
+
+    with engine.begin() as conn:
+        detached = conn.execute(text("SELECT tablename FROM pg_tables WHERE tablename LIKE :pattern"),
+                                {"pattern": r"transactions\_y%\_detached\_%"}).scalars().all()
+        for name in detached:
+            conn.execute(text(f"DROP TABLE {name}"))
+    return identical
+
+
+# --- API ---
+def api_client(api_url):
+    """A function that GETs a path and returns the status code, over HTTP or in-process."""
+    if api_url:
+        def get(path):
+            with urllib.request.urlopen(urllib.parse.urljoin(api_url, path)) as response:
+                response.read()
+                return response.status
+        return get, contextlib.nullcontext()
+
+    from fastapi.testclient import TestClient
+    sys.path.insert(0, ROOT_DIR)
+    import main
+
+    client = TestClient(main.app)
+    return (lambda path: client.get(path).status_code), client
+
+
+def bench_api(results, api_url, duration, concurrency):
+    """Hammers each endpoint for `duration` seconds and records latency percentiles and requests/s."""
+    get, client = api_client(api_url)
+
+    def worker(endpoint):
+        latencies, deadline = [], time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = get(endpoint)
+            if status != 200:
+                raise RuntimeError(f"{endpoint} returned {status}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with client:
+        for endpoint in ENDPOINTS:
+            get(endpoint)  # warm up the pool and any caches
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                runs = [pool.submit(worker, endpoint) for _ in range(concurrency)]
+                latencies = np.concatenate([run.result() for run in runs])
+            elapsed = time.perf_counter() - start
+
+            name = endpoint.split("?")[0].strip("/").replace("-", "_")
+            for p in (50, 95, 99):
+                results.add(f"api.{name}.p{p}_ms", np.percentile(latencies, p) * 1000, "ms")
+            results.add(f"api.{name}.requests_per_second", len(latencies) / elapsed, "req/s", better="higher")
+
+
+# --- Baseline comparison ---
+def compare(current, baseline, tolerance):
+    """Prints every metric against the baseline; returns the list of regressions."""
+    regressions = []
+    print(f"\n{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None:
+            continue
+        old, new = base["value"], metric["value"]
+        change = (new - old) / old if old else 0.0
+        worse = change > tolerance if metric["better"] == "lower" else change < -tolerance
+        if metric["unit"] == "s" and max(old, new) < NOISE_FLOOR_S:
+            worse = False
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:<60} {old:>12.4g} {new:>12.4g} {change:>+7.0%}{flag}")
+        if worse:
+            regressions.append(name)
+
+    if current["correctness"]["flags_digest"] != baseline["correctness"]["flags_digest"]:
+        print("\n❌ Flags differ from the baseline run (rules changed? refresh it with --save-baseline).")
+        regressions.append("correctness.flags_digest")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and regression suite for the fraud pipeline.")
+    parser.add_argument("--users", type=int, nargs="+", default=[200, 2000, 20000],
+                        help="Generate this many users (about 6.5 txns each) per size.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timings are the best of this many runs.")
+    parser.add_argument("--skip-db", action="store_true", help="Skip the loading and API benchmarks.")
+    parser.add_argument("--api-url", help="Load-test a running API (e.g. http://localhost:8000) instead of "
+                                          "main.py in-process. It should serve the benchmark database.")
+    parser.add_argument("--api-seconds", type=float, default=5, help="Seconds spent on each endpoint.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent API clients.")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline.")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare with --baseline and exit with 1 on a regression or changed flags.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative change that counts as a regression (0.25 = 25%% worse).")
+    args = parser.parse_args()
+
+    os.environ["POSTGRES_DB"] = BENCH_DB  # read by load_to_postgres.py and main.py when they are imported
+    results = Results()
+    cwd, workdir = os.getcwd(), tempfile.mkdtemp(prefix="fnb_bench_")
+    os.chdir(workdir)  # the stages read and write their files in the working directory
+    try:
+        print("🧪 Correctness")
+        correctness = check_correctness(workdir)
+
+        engine = None
+        if not args.skip_db:
+            try:
+                engine = prepare_bench_database()
+            except Exception as e:
+                results.skip("Loading and API", f"no Postgres for {BENCH_DB} ({e.__class__.__name__}: {e})")
+
+        for n_users in args.users:
+            print(f"\n⏱️ {n_users} users")
+            users, transactions = bench_generation(results, n_users, args.repeat)
+            label = f"users_{n_users}"
+            flagged = bench_detection(results, transactions, label, args.repeat)
+            if engine is not None:
+                bench_load(results, engine, label, users, flagged)
+
+        if engine is not None:
+            correctness["checks"]["retention_reload"] = check_retention_reload(engine, flagged)
+            print(f"  {'retention_reload':<60} "
+                  f"{'identical' if correctness['checks']['retention_reload'] else 'DIFFERENT':>14}")
+
+        if engine is not None:
+            print(f"\n🌐 API ({args.api_url or 'in-process'}, {args.concurrency} clients)")
+            bench_api(results, args.api_url, args.api_seconds, args.concurrency)
+    finally:
+        os.chdir(cwd)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "args": {"users": args.users, "repeat": args.repeat, "concurrency": args.concurrency},
+        "metrics": results.metrics,
+        "correctness": correctness,
+        "notes": results.notes,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results: {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved: {args.baseline}")
+
+    failed = [name for name, identical in correctness["checks"].items() if not identical]
+    if failed:
+        print(f"❌ Flags differ between implementations: {', '.join(failed)}")
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"❌ No baseline at {args.baseline}; create one with --save-baseline.")
+        with open(args.baseline) as f:
+            failed += compare(report, json.load(f), args.tolerance)
+    if failed:
+        sys.exit(1)
+    print("✅ No regressions." if args.compare else "✅ Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,12 +21,13 @@ const getWeekNumber = (d) => {
   return `Week ${weekNo}`;
 };
 
+// data: the daily rows of /summary, oldest first
 const FraudTrendChart = ({ data }) => {
   const weeklyData = data.reduce((acc, curr) => {
-    const dateObj = new Date(curr.timestamp);
-    if (isNaN(dateObj)) return acc;
+    const dateObj = new Date(`${curr.day}T00:00:00`);
+    if (isNaN(dateObj) || !curr.fraud_txns) return acc;
     const week = getWeekNumber(dateObj);
-    acc[week] = (acc[week] || 0) + 1;
+    acc[week] = (acc[week] || 0) + curr.fraud_txns;
     return acc;
   }, {});
 
@@ -13,15 +13,16 @@ import {
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend);
 
+// data: the daily rows of /summary, oldest first
 const TransactionChart = ({ data }) => {
   const monthlyData = data.reduce((acc, curr) => {
-    const dateObj = new Date(curr.timestamp);
+    const dateObj = new Date(`${curr.day}T00:00:00`);
     if (isNaN(dateObj)) return acc;
     const monthYear = dateObj.toLocaleDateString('default', {
       year: 'numeric',
       month: 'short',
     });
-    acc[monthYear] = (acc[monthYear] || 0) + 1;
+    acc[monthYear] = (acc[monthYear] || 0) + curr.total_txns;
     return acc;
   }, {});
 
@@ -1,6 +1,5 @@
 // frontend/src/components/UserList.jsx
 import React, { useState } from 'react';
-import { calculateRiskScore } from '../utils/calculateRiskScore';
 
 const RiskBadge = ({ level }) => {
     const baseClasses = "px-2 py-1 text-xs font-medium rounded-full";
@@ -12,22 +11,15 @@ const RiskBadge = ({ level }) => {
     return <span className={`${baseClasses} ${styles[level] || styles.Low}`}>{level || 'Low'} Risk</span>;
 };
 
-const UserList = ({ users = [], transactions = [], onUserClick }) => {
+// users: each with the score and level /users/risk gives them
+const UserList = ({ users = [], onUserClick }) => {
     const safeUsers = Array.isArray(users) ? users : [];
-    const safeTransactions = Array.isArray(transactions) ? transactions : [];
 
     const [visibleUserCount, setVisibleUserCount] = useState(5);
     const USERS_PER_LOAD = 5;
 
-    const usersWithRisk = safeUsers.map(user => {
-        const userIdStr = String(user.user_id).trim();
-        const userTransactions = safeTransactions.filter(tx => String(tx.user_id).trim() === userIdStr);
-        const { score, level } = calculateRiskScore(userTransactions, safeTransactions);
-        return { ...user, score, level };
-    });
-
-    // Sort usersWithRisk by score from highest to lowest
-    const sortedUsersWithRisk = [...usersWithRisk].sort((a, b) => b.score - a.score); // MODIFIED LINE
+    // Sort users by score from highest to lowest
+    const sortedUsersWithRisk = [...safeUsers].sort((a, b) => b.score - a.score); // MODIFIED LINE
 
     const displayedUsers = sortedUsersWithRisk.slice(0, visibleUserCount); // MODIFIED LINE
     const hasMoreUsers = sortedUsersWithRisk.length > visibleUserCount; // MODIFIED LINE
@@ -10,15 +10,43 @@ import FraudTrendChart from '../components/FraudTrendChart';
 import TransactionChart from '../components/TransactionChart';
 
 // API fetching functions
-const fetchUsers = () =>
-  fetch('http://127.0.0.1:8000/users').then(res => res.json());
-
-const fetchTransactions = () =>
-  fetch('http://127.0.0.1:8000/transactions').then(res => res.json());
+const fetchJson = path =>
+  fetch(`http://127.0.0.1:8000${path}`).then(res => res.json());
+
+// Stats cards and charts come from /summary and user risk from /users/risk, both
+// precomputed server-side; only the recent fraud table and the user detail page read
+// transactions, and only the rows they show
+const RECENT_FRAUD_PARAMS = new URLSearchParams({
+  limit: 7,
+  fields: 'transaction_id,user_id,timestamp,amount,merchant',
+});
+const TRANSACTIONS_PAGE_SIZE = 5000;
+
+// Follows the X-Next-Cursor header until the last page
+const fetchTransactions = async filters => {
+  const transactions = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: TRANSACTIONS_PAGE_SIZE, ...filters });
+    if (cursor) params.set('cursor', cursor);
+    const res = await fetch(`http://127.0.0.1:8000/transactions?${params}`);
+    transactions.push(...(await res.json()));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return transactions.map(tx => ({
+    ...tx,
+    is_fraud: Number(tx.is_fraud),
+    amount: parseFloat(tx.amount),
+    ...('balance_before_txn' in tx && { balance_before_txn: parseFloat(tx.balance_before_txn) }),
+    ...('balance_after_txn' in tx && { balance_after_txn: parseFloat(tx.balance_after_txn) }),
+    ...('fraud_score' in tx && { fraud_score: parseFloat(tx.fraud_score) }),
+  }));
+};
 
 const Home = () => {
   const [users, setUsers] = useState([]);
-  const [transactions, setTransactions] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [recentFraud, setRecentFraud] = useState([]);
   const [isRefreshing, setIsRefreshing] = useState(false);
   const [lastUpdated, setLastUpdated] = useState(null);
   const [selectedUserData, setSelectedUserData] = useState(null);
@@ -26,27 +54,26 @@ const Home = () => {
   const fetchData = useCallback(async () => {
     setIsRefreshing(true);
     try {
-      const [usersData, transactionsData] = await Promise.all([
-        fetchUsers(),
-        fetchTransactions(),
+      const [usersData, riskData, summaryData, recentFraudData] = await Promise.all([
+        fetchJson('/users'),
+        fetchJson('/users/risk'),
+        fetchJson('/summary'),
+        fetchJson(`/fraud-transactions?${RECENT_FRAUD_PARAMS}`),
       ]);
 
-      const processedTransactions = transactionsData.map(tx => ({
-        ...tx,
-        is_fraud: Number(tx.is_fraud),
-        amount: parseFloat(tx.amount),
-        balance_before_txn: parseFloat(tx.balance_before_txn),
-        balance_after_txn: parseFloat(tx.balance_after_txn),
-        fraud_score: parseFloat(tx.fraud_score),
-      }));
-
-      setUsers(usersData);
-      setTransactions(processedTransactions);
+      const riskByUser = new Map(riskData.map(risk => [risk.user_id, risk]));
+      setUsers(usersData.map(user => ({
+        ...user,
+        score: riskByUser.get(user.user_id)?.risk_score ?? 0,
+        level: riskByUser.get(user.user_id)?.risk_level ?? 'Low',
+      })));
+      setSummary(summaryData);
+      setRecentFraud(recentFraudData);
       setLastUpdated(new Date());
 
       console.log('📦 Fetched data:', {
         users: usersData.length,
-        transactions: processedTransactions.length,
+        transactions: summaryData.total_txns,
       });
     } catch (error) {
       console.error('Failed to fetch data:', error);
@@ -61,26 +88,23 @@ const Home = () => {
     return () => clearInterval(intervalId);
   }, [fetchData]);
 
-  const handleUserClick = user => {
-    const userTransactions = transactions.filter(
-      tx => tx.user_id === user.user_id
-    );
-    setSelectedUserData({ user, transactions: userTransactions });
+  const handleUserClick = async user => {
+    try {
+      const userTransactions = await fetchTransactions({ user_id: user.user_id });
+      setSelectedUserData({ user, transactions: userTransactions });
+    } catch (error) {
+      console.error('Failed to fetch user transactions:', error);
+    }
   };
 
   const handleBackToDashboard = () => {
     setSelectedUserData(null);
   };
 
-  const totalTransactions = transactions.length;
-  const fraudulentTxns = transactions.filter(
-    tx => Number(tx.is_fraud) === 1
-  ).length;
-
-  const fraudRate =
-    totalTransactions > 0
-      ? ((fraudulentTxns / totalTransactions) * 100).toFixed(2) + '%'
-      : '0.00%';
+  const totalTransactions = summary ? summary.total_txns : 0;
+  const fraudulentTxns = summary ? summary.fraud_txns : 0;
+  const fraudRate = ((summary ? summary.fraud_rate : 0) * 100).toFixed(2) + '%';
+  const daily = summary ? summary.daily : [];
 
   if (selectedUserData) {
     return (
@@ -113,13 +137,13 @@ const Home = () => {
             <h2 className="text-xl font-semibold mb-4">
               Monthly Transaction Volume
             </h2>
-            <TransactionChart data={transactions} />
+            <TransactionChart data={daily} />
           </div>
           <div className="bg-white p-6 shadow-md border border-gray-300">
             <h2 className="text-xl font-semibold mb-4">
               Weekly Fraud Trend
             </h2>
-            <FraudTrendChart data={transactions.filter(tx => tx.is_fraud)} />
+            <FraudTrendChart data={daily} />
           </div>
         </div>
 
@@ -128,13 +152,12 @@ const Home = () => {
           <div className="xl:col-span-1 h-full"> {/* h-full remains here */}
             <UserList
               users={users}
-              transactions={transactions}
               onUserClick={handleUserClick}
             />
           </div>
           <div className="xl:col-span-2 h-full"> {/* h-full remains here */}
             <FraudTransactionsList
-              transactions={transactions.filter(tx => tx.is_fraud)}
+              transactions={recentFraud}
             />
           </div>
         </div>
@@ -1,26 +1,278 @@
-import subprocess
+import argparse
+import ast
+import hashlib
+import json
+import os
 import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts")
+CACHE_FILE = ".pipeline_cache.json"  # input key and output fingerprint of each stage's last run
+REPORT_FILE = "pipeline_report.json"
+
+parser = argparse.ArgumentParser(description="Run the FNB fraud detection pipeline.")
+parser.add_argument("--incremental", action="store_true",
+                    help="Score only transactions added to the transactions file since the last incremental "
+                         "run and upsert them, instead of regenerating and reloading everything.")
+parser.add_argument("--format", choices=["parquet", "csv"],
+                    help="File format passed between stages (default: PIPELINE_FORMAT from .env, else parquet).")
+parser.add_argument("--users", type=int, default=50, help="Number of users to generate.")
+parser.add_argument("--fraud-threshold", type=int,
+                    help="Fraud score at which a transaction is flagged (default: FRAUD_SCORE_THRESHOLD).")
+parser.add_argument("--no-cache", action="store_true",
+                    help=f"Rerun every stage, even if its inputs match the last run recorded in {CACHE_FILE}.")
+parser.add_argument("--report", default=REPORT_FILE,
+                    help="Where to write the JSON run report (wall time, rows/s and peak RSS per stage).")
+args = parser.parse_args()
+
+if args.format:
+    os.environ["PIPELINE_FORMAT"] = args.format  # read by scripts/pipeline_io.py when it is imported below
+
+# The stages run in this process as plain functions, so pandas is imported once and each
+# stage gets the previous stage's DataFrame without re-reading it from disk.
+sys.path.append(SCRIPTS_DIR)
+from detect_fraud import (FRAUD_SCORE_THRESHOLD, INPUT_FILE, OUTPUT_FILE, STATE_FILE,  # noqa: E402
+                          detect_fraud, detect_fraud_incremental, export)
+from generate_transactions import generate_transactions  # noqa: E402
+from generate_users import generate_users  # noqa: E402
+from load_to_postgres import load_data_to_postgres  # noqa: E402
+from pipeline_io import TRANSACTIONS, USERS, data_path, read_frame  # noqa: E402
+from user_profiles import PROFILES_FILE, UserProfiles  # noqa: E402
+
+
+# --- Peak memory ---
+def reset_peak_rss():
+    """Resets the kernel's high-water mark of this process's RSS (Linux only), so it can be read per stage."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Peak RSS of this process since the last reset_peak_rss(), or since it started where that is unsupported."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+# --- Stage cache ---
+def frame_hash(df):
+    """Content hash of a DataFrame: column names plus a vectorized hash of every row."""
+    digest = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def local_imports(module):
+    """The scripts/ modules `module` imports, directly or through other scripts/ modules, itself included."""
+    found, pending = set(), [module]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(SCRIPTS_DIR, f"{name}.py")
+        if name in found or not os.path.exists(path):
+            continue
+        found.add(name)
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split(".")[0])
+    return sorted(found)
+
+
+def source_hash(module):
+    """Hash of a stage's scripts/ module and all it imports, so editing any of them invalidates its cached output."""
+    digest = hashlib.sha256()
+    for name in local_imports(module):
+        with open(os.path.join(SCRIPTS_DIR, f"{name}.py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def stage_key(stage, params, inputs, code):
+    """Cache key of a stage run: its parameters, the content hashes of its inputs and its code."""
+    payload = json.dumps({"stage": stage, "params": params, "inputs": inputs, "code": code}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fingerprint(path):
+    """Size and mtime of a file, or of every file in a Parquet dataset; None if it is missing."""
+    if os.path.isfile(path):
+        files = [path]
+    elif os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        return None
+    return [[os.path.relpath(f, path), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in files]
+
+
+class StageCache:
+    """The key of each stage's last run and a fingerprint of the output it wrote.
+
+    A stage is skipped when its key is unchanged and its output on disk is still the
+    one it wrote; anything else (a different key, a deleted or rewritten output) reruns it.
+    """
+
+    def __init__(self, path=CACHE_FILE, enabled=True):
+        self.path, self.enabled = path, enabled
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def lookup(self, stage, key):
+        entry = self.entries.get(stage)
+        if not self.enabled or not entry or entry["key"] != key:
+            return None
+        return entry if fingerprint(entry["output"]) == entry["fingerprint"] else None
+
+    def store(self, stage, key, output, rows, content_hash):
+        self.entries[stage] = {"key": key, "output": output, "fingerprint": fingerprint(output),
+                               "rows": rows, "hash": content_hash}
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+# --- Run report ---
+class RunReport:
+    """Wall time, rows, rows/s (null if cached) and peak RSS of each stage, written out as JSON."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block as one stage; the block sets record["rows"] and, if skipped, record["cached"]."""
+        record = {"stage": name, "cached": False, "rows": 0}
+        reset_peak_rss()
+        start = time.perf_counter()
+        yield record
+        seconds = time.perf_counter() - start
+        peak = peak_rss_mb()
+        throughput = None if record["cached"] else round(record["rows"] / max(seconds, 1e-9))
+        record.update(seconds=round(seconds, 3), rows_per_second=throughput,
+                      peak_rss_mb=None if peak is None else round(peak, 1))
+        self.stages.append(record)
+
+    def write(self, path):
+        report = {"mode": self.mode, "started_at": self.started_at,
+                  "seconds": round(time.perf_counter() - self._start, 3), "stages": self.stages}
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def cached_stage(report, cache, name, key, output, compute, need_frame=True):
+    """Runs compute() (which writes `output` and returns its frame) unless the cache has the same key.
+
+    A skipped stage's frame is read back from `output`, and only if a later stage needs it.
+    Returns (frame, content hash of the output).
+    """
+    with report.stage(name) as record:
+        entry = cache.lookup(name, key)
+        if entry:
+            print(f"⏭️ Inputs unchanged, reusing {output}.")
+            frame = read_frame(output) if need_frame else None
+            record.update(cached=True, rows=entry["rows"])
+            return frame, entry["hash"]
+        frame = compute()
+        content_hash = frame_hash(frame)
+        cache.store(name, key, output, len(frame), content_hash)
+        record["rows"] = len(frame)
+        return frame, content_hash
+
+
+report = RunReport("incremental" if args.incremental else "full")
+threshold = FRAUD_SCORE_THRESHOLD if args.fraud_threshold is None else args.fraud_threshold
+
+if args.incremental:
+    print("🔁 Starting incremental FNB Fraud Detection run...\n")
+
+    print("🚨 Detecting fraud on new transactions...")
+    with report.stage("detect_fraud") as record:
+        flagged = detect_fraud_incremental(read_frame(INPUT_FILE), threshold=threshold)
+        export(flagged, OUTPUT_FILE)
+        record["rows"] = len(flagged)
+        print(f"🔁 Scored {len(flagged)} new or updated transactions.")
+
+    print("\n📦 Upserting into PostgreSQL...")
+    with report.stage("load_to_postgres") as record:
+        load_data_to_postgres(upsert=True)
+        record["rows"] = len(flagged)
+
+    report.write(args.report)
+    print(f"\n✅ Incremental run complete. Run report: {args.report}")
+    sys.exit(0)
 
 print("🔧 Starting FNB Fraud Detection Pipeline...\n")
+cache = StageCache(enabled=not args.no_cache)
 
 # Step 1: Generate users
 print("👤 Generating users...")
-# This calls scripts/generate_users.py to create users.csv
-subprocess.run([sys.executable, "scripts/generate_users.py"], check=True)
+users_file = data_path(USERS)
+users, users_hash = cached_stage(
+    report, cache, "generate_users",
+    stage_key("generate_users", {"n": args.users, "output": users_file}, {},
+              source_hash("generate_users")),
+    users_file, lambda: generate_users(n=args.users))
 
 # Step 2: Generate transactions
 print("\n💳 Generating transactions...")
-# This should call scripts/generate_transactions.py to create transactions.csv
-subprocess.run([sys.executable, "scripts/generate_transactions.py"], check=True)
+transactions_file = data_path(TRANSACTIONS)
+transactions, transactions_hash = cached_stage(
+    report, cache, "generate_transactions",
+    stage_key("generate_transactions", {"output": transactions_file}, {"users": users_hash},
+              source_hash("generate_transactions")),
+    transactions_file, lambda: generate_transactions(users_df=users))
+
 
 # Step 3: Detect fraud
+def detect():
+    # The regenerated data makes any saved incremental state stale; the next --incremental run rebuilds it
+    if os.path.exists(STATE_FILE):
+        os.remove(STATE_FILE)
+    flagged = detect_fraud(transactions, threshold)
+    export(flagged, OUTPUT_FILE)
+    UserProfiles.from_transactions(flagged).save(PROFILES_FILE)
+    print(f"✅ Saved: {OUTPUT_FILE} and {PROFILES_FILE}")
+    return flagged
+
+
 print("\n🚨 Detecting fraud...")
-# This should call scripts/detect_fraud.py to process transactions and add fraud flags
-subprocess.run([sys.executable, "scripts/detect_fraud.py"], check=True)
+cached_stage(
+    report, cache, "detect_fraud",
+    stage_key("detect_fraud", {"threshold": threshold, "output": OUTPUT_FILE}, {"transactions": transactions_hash},
+              source_hash("detect_fraud")),
+    OUTPUT_FILE, detect, need_frame=False)
+flagged_rows = report.stages[-1]["rows"]
 
-# Step 4: Load to PostgreSQL
+# Step 4: Load to PostgreSQL. Always runs: the database can change independently of the files,
+# and the merge only rewrites rows that differ.
 print("\n📦 Loading data into PostgreSQL...")
-# This should call scripts/load_to_postgres.py to load data into the database
-subprocess.run([sys.executable, "scripts/load_to_postgres.py"], check=True)
+with report.stage("load_to_postgres") as record:
+    load_data_to_postgres()
+    record["rows"] = flagged_rows
 
-print("\n✅ Pipeline complete. Check your database.")
+report.write(args.report)
+print(f"\n✅ Pipeline complete. Check your database. Run report: {args.report}")
@@ -1,79 +1,446 @@
-# scripts/detect_fraud.py (Updated with a New Balance-Based Rule)
+# scripts/detect_fraud.py (Vectorized rule engine)
 
+import argparse
+import os
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import timedelta
+from functools import lru_cache
+from typing import Callable, Optional
 
-df = pd.read_csv("transactions.csv")
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values(by=["user_id", "timestamp"]).reset_index(drop=True)
+from pipeline_io import (FLAGGED_TRANSACTIONS, TRANSACTIONS, clear_output, data_path, file_format, iter_user_frames,
+                         write_frame)
+from transaction_frame import (DERIVED_COLUMNS, add_derived_columns, category_mask, compact_transactions, hour_of_day,
+                               narrowest_int, read_transactions)
+from user_profiles import PROFILES_FILE, UserProfiles
+from velocity import STATS, window_index
 
-df['is_fraud'] = 0
-df['rules_applied'] = ''
-df['fraud_score'] = 0 
-df['time_diff_from_last'] = df.groupby("user_id")["timestamp"].diff().dt.total_seconds()
+INPUT_FILE = data_path(TRANSACTIONS)
+OUTPUT_FILE = data_path(FLAGGED_TRANSACTIONS)
+STATE_FILE = "detection_state.csv"  # per-user history kept between incremental runs
+LAST_SEEN_COLUMN = "location_last_seen"  # optional input: when the user last used the location before the frame
+THRESHOLD_COLUMN = "fraud_threshold"  # state column: the threshold the state's is_fraud flags were set with
 
-def flag(df, mask, rule, score_increment=1): 
-    df.loc[mask, 'rules_applied'] = df.loc[mask, 'rules_applied'].apply(
-        lambda r: rule if r == '' else f"{r}|{rule}"
-    )
-    df.loc[mask, 'fraud_score'] += score_increment 
+RAPID_FIRE_WINDOW = timedelta(minutes=5)    # RAPID_FIRE_TXNS txns within this window
+RAPID_FIRE_TXNS = 3
+NEW_LOCATION_LOOKBACK = timedelta(days=30)  # locations seen within this window are "known"
+FRAUD_SCORE_THRESHOLD = 3
+RULE_SEPARATOR = "|"
+
+
+# --- Rule registry ---
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    score: int
+    predicate: Callable[[pd.DataFrame], pd.Series]  # vectorized: compact frame -> boolean mask
+    bit: int
+    lookback: Optional[timedelta] = None  # how far back in a user's history the rule looks
+    profile: bool = False  # reads what it needs from before the frame out of the user profiles instead
+    columns: tuple = ()  # input columns beyond realtime_scoring.SCORED_COLUMNS
+
+
+RULES = []
+
+
+def register_rule(name, score=1, lookback=None, profile=False, columns=()):
+    """Registers a vectorized predicate as a fraud rule.
+
+    Each rule gets the next bit in the `rules_mask` column, so the order of
+    registration is also the order rule names are listed in. Rules that look at a
+    user's earlier txns declare how far back with `lookback`, so streaming and
+    incremental runs keep enough history. Rules that can get that history from the
+    user profiles (user_profiles.py) set `profile`, and incremental runs keep no
+    rows for them. Rules that read columns the real-time scorer does not otherwise
+    pass (realtime_scoring.SCORED_COLUMNS) list them in `columns`.
+    """
+    def decorator(predicate):
+        RULES.append(Rule(name=name, score=score, predicate=predicate, bit=len(RULES), lookback=lookback,
+                          profile=profile, columns=tuple(columns)))
+        return predicate
+    return decorator
+
+
+def register_window_rule(name, stat, window, threshold, column=None, score=1):
+    """Registers a velocity rule: `stat` over the user's txns in the `window` up to each txn reaches `threshold`.
+
+    `stat` is one of velocity.STATS; every stat but "count" needs a column. For example
+
+        register_window_rule("Spend Spike", "sum", timedelta(hours=24), 100_000, column="amount")
+        register_window_rule("Merchant Hopping", "distinct", timedelta(minutes=10), 4, column="merchant")
+
+    The real-time scorer (realtime_scoring.py) passes the column along with each
+    incoming txn, but only keeps each user's past timestamps and locations, so there
+    the column is missing on earlier txns: a sum or max only covers the incoming txns
+    and a distinct count only their values.
+    """
+    if stat not in STATS:
+        raise ValueError(f"Unknown window statistic {stat!r}; expected one of {STATS}.")
+    if stat != "count" and column is None:
+        raise ValueError(f"The {stat!r} window statistic needs a column.")
+
+    def predicate(df):
+        values = None if column is None else df[column]
+        return window_index(df).feature(stat, window, values) >= threshold
+    predicate.__name__ = f"{stat}_{column or 'txns'}_window"
+    register_rule(name, score, lookback=window, columns=() if column is None else (column,))(predicate)
+    return predicate
+
+
+def history_lookback(profiles=False):
+    """The longest lookback of the registered rules; with `profiles`, of those that do not read the profiles."""
+    return max((rule.lookback for rule in RULES if rule.lookback is not None and not (profiles and rule.profile)),
+               default=timedelta(0))
+
+
+def rule_output_types():
+    """Narrowest dtypes of the `rules_mask` and `fraud_score` columns for the registered rules."""
+    return narrowest_int(0, (1 << len(RULES)) - 1), narrowest_int(0, sum(rule.score for rule in RULES))
+
+
+@lru_cache(maxsize=None)
+def rule_names(rules_mask):
+    """Names of the rules set in a `rules_mask` value, in registration order."""
+    return [rule.name for rule in RULES if int(rules_mask) >> rule.bit & 1]
+
+
+def rules_mask_to_names(masks):
+    """Maps a `rules_mask` column to the readable `rules_applied` strings (NaN when no rule hit).
+
+    Only the distinct mask values are translated, so this is cheap even on large frames.
+    """
+    names = {m: RULE_SEPARATOR.join(rule_names(m)) or np.nan for m in masks.unique()}
+    return masks.map(names)
+
+
+# --- Rules ---
+# Rules take a frame in transaction_frame.py's compact layout and compare text columns
+# on their integer category codes.
+@register_rule("Large Withdrawal", score=2)
+def large_withdrawal(df):
+    # Adjusted for more realistic ZAR context
+    return (df["amount"].to_numpy() > 50000) & category_mask(df["type"], lambda t: t.lower() == "withdrawal")
+
+
+@register_rule("Odd Hours", score=1)
+def odd_hours(df):
+    hour = hour_of_day(df)
+    return (hour < 4) | (hour > 23)
+
+
+@register_rule("Rapid Fire", score=2, lookback=RAPID_FIRE_WINDOW)
+def rapid_fire_mask(df):
+    """Flags every txn that is part of RAPID_FIRE_TXNS consecutive txns by one user within RAPID_FIRE_WINDOW.
+
+    Expects df sorted by user_id, timestamp. A txn completes a burst when its window
+    holds RAPID_FIRE_TXNS txns, and then the txns before it in the burst are flagged too.
+    """
+    hit = window_index(df).count(RAPID_FIRE_WINDOW) >= RAPID_FIRE_TXNS
+
+    # A hit on row i also flags rows i-1 .. i-RAPID_FIRE_TXNS+1 (all in its window, so the same user)
+    mask = hit.copy()
+    for back in range(1, RAPID_FIRE_TXNS):
+        mask[:-back] |= hit[back:]
+    return pd.Series(mask, index=df.index)
+
+
+def location_last_seen(df):
+    """When the user last used each txn's location at an earlier timestamp (NaT if never, or missing).
+
+    Looks in df's own rows and, if df has a LAST_SEEN_COLUMN (incremental runs fill
+    it in from the user profiles), in that column, taking the later of the two.
+    """
+    last_seen = window_index(df).last_seen(df["location"])
+    if LAST_SEEN_COLUMN in df:
+        last_seen = np.fmax(last_seen, df[LAST_SEEN_COLUMN].to_numpy(dtype=last_seen.dtype))
+    return last_seen
+
+
+@register_rule("New Location", score=1, lookback=NEW_LOCATION_LOOKBACK, profile=True)
+def new_location_mask(df):
+    """Flags txns whose location the user has not used in the NEW_LOCATION_LOOKBACK before it.
+
+    Expects df sorted by user_id, timestamp. A missing location is never known.
+    """
+    times = df["timestamp"].to_numpy()
+    last_seen = location_last_seen(df)
+    return pd.Series(~(last_seen >= times - np.timedelta64(NEW_LOCATION_LOOKBACK)), index=df.index)
+
+
+@register_rule("Excessive Txn relative to Balance", score=3)  # High score as it's very suspicious
+def excessive_txn_relative_to_balance(df):
+    # Withdrawals or transfers where the amount is > 1.2 times the balance before
+    # the transaction (allowing for small overdrafts).
+    return category_mask(df["type"], {"Withdrawal", "Transfer"}) & \
+           (df["amount"].to_numpy() > df["balance_before_txn"].to_numpy() * 1.2)
+
+
+# --- Engine ---
+def evaluate_rules(df, rules=None):
+    """Evaluates every registered rule in one pass, returning `rules_mask` and `fraud_score` arrays."""
+    rules_mask = np.zeros(len(df), dtype=np.int64)
+    fraud_score = np.zeros(len(df), dtype=np.int64)
+    for rule in RULES if rules is None else rules:
+        hit = np.asarray(rule.predicate(df), dtype=bool)
+        rules_mask[hit] |= 1 << rule.bit
+        fraud_score[hit] += rule.score
+    return rules_mask, fraud_score
+
+
+def apply_rules(df, rules=None):
+    """Sets the `rules_mask` and `fraud_score` columns from evaluate_rules()."""
+    rules_mask, fraud_score = evaluate_rules(df, rules)
+    mask_type, score_type = rule_output_types()
+    df['rules_mask'] = rules_mask.astype(mask_type)
+    df['fraud_score'] = fraud_score.astype(score_type)
     return df
 
-# Rule: Large Withdrawal - Adjusted for more realistic ZAR context
-mask = (df["amount"] > 50000) & (df["type"].str.lower() == "withdrawal")
-df = flag(df, mask, "Large Withdrawal", score_increment=2) 
-
-# Rule: Odd Hours
-df['hour'] = df['timestamp'].dt.hour
-mask = (df['hour'] < 4) | (df['hour'] > 23)
-df = flag(df, mask, "Odd Hours", score_increment=1) 
-
-# Rule: Rapid Fire (3 txns in 5 mins)
-def rapid_fire(group):
-    mask = pd.Series(False, index=group.index)
-    for i in range(len(group)):
-        if i >= 2:
-            delta = group.iloc[i]["timestamp"] - group.iloc[i-2]["timestamp"]
-            if delta.total_seconds() <= 300:
-                mask.iloc[i] = True
-                mask.iloc[i-1] = True
-                mask.iloc[i-2] = True
-    return mask
-
-rf_flags = df.groupby("user_id", group_keys=False).apply(rapid_fire)
-df = flag(df, rf_flags, "Rapid Fire", score_increment=2) 
-
-# Rule: New Location
-def new_loc(group):
-    mask = pd.Series(False, index=group.index)
-    for i in range(len(group)):
-        current = group.iloc[i]
-        lookback = group[(group["timestamp"] < current["timestamp"]) & 
-                         (group["timestamp"] >= current["timestamp"] - timedelta(days=30))]
-        locations = set(lookback["location"].dropna())
-        if current["location"] not in locations:
-            mask.iloc[i] = True
-    return mask
-
-nl_flags = df.groupby("user_id", group_keys=False).apply(new_loc)
-df = flag(df, nl_flags, "New Location", score_increment=1) 
-
-# NEW RULE: Excessive Withdrawal/Transfer Relative to Balance
-# This flags withdrawals or transfers that are significantly more than the balance available.
-# We'll use a threshold, e.g., amount is > 1.2 times balance (allowing for small overdrafts)
-# This rule specifically targets transactions where the amount is much higher than the balance before the transaction.
-mask = (df["type"].isin(["Withdrawal", "Transfer"])) & \
-       (df["amount"] > df["balance_before_txn"] * 1.2) # Amount is 20% more than balance
-       # This condition helps avoid flagging legitimate small transactions that barely go over
-       # df["balance_before_txn"] > 0 # Optionally, only apply if user had some balance to begin with
-
-df = flag(df, mask, "Excessive Txn relative to Balance", score_increment=3) # High score as it's very suspicious
-
-# Final decision for 'is_fraud' based on combined fraud_score
-FRAUD_SCORE_THRESHOLD = 3 
-df['is_fraud'] = (df['fraud_score'] >= FRAUD_SCORE_THRESHOLD).astype(int)
-
-df["rules_applied"].replace("", np.nan, inplace=True)
-df.to_csv("transactions_with_fraud_flags.csv", index=False)
-print("✅ Saved: transactions_with_fraud_flags.csv")
\ No newline at end of file
+
+def detect_fraud(df, threshold=FRAUD_SCORE_THRESHOLD):
+    """Scores transactions, returning them sorted by user_id, timestamp in the compact layout."""
+    df = compact_transactions(df)
+    df = df.sort_values(by=["user_id", "timestamp"]).reset_index(drop=True)
+
+    df['is_fraud'] = np.int8(0)
+    df = apply_rules(df)
+
+    # Final decision for 'is_fraud' based on combined fraud_score
+    df['is_fraud'] = (df['fraud_score'] >= threshold).astype(np.int8)
+    return df
+
+
+def export_csv(df, path=OUTPUT_FILE, mode="w", header=True):
+    """Writes flagged transactions, adding the readable `rules_applied` column next to `rules_mask`.
+
+    DERIVED_COLUMNS are computed here unless df already has them. Add them before
+    taking a slice of a frame, since a user's first row in the slice needs the row before it.
+    """
+    out = df.copy(deep=False)
+    out.insert(out.columns.get_loc("rules_mask"), "rules_applied", rules_mask_to_names(out["rules_mask"]))
+    if "hour" not in out:
+        add_derived_columns(out)
+    out.to_csv(path, index=False, mode=mode, header=header)
+
+
+def export(df, path=OUTPUT_FILE, part=None):
+    """Writes flagged transactions in the format of `path`.
+
+    CSV goes through export_csv(). Parquet leaves out the columns readers can derive
+    (DERIVED_COLUMNS and rules_applied). `part` writes one chunk of a larger output,
+    as in pipeline_io.write_frame().
+    """
+    if file_format(path) == "csv":
+        export_csv(df, path, mode="a" if part else "w", header=not part)
+    else:
+        write_frame(df.drop(columns=DERIVED_COLUMNS, errors="ignore"), path, part)
+
+
+# --- Per-user state for streaming and incremental runs ---
+HELD_ROWS = RAPID_FIRE_TXNS - 1  # Rapid Fire on a later txn can still flag a user's last 2 txns
+
+
+def _user_state(flagged, columns, lookback=None):
+    """Rows of each user in `flagged` that the user's later txns still depend on.
+
+    A user's last HELD_ROWS txns get re-evaluated together with later txns, so we keep
+    `lookback` (default: the longest rule lookback, New Location's) before the first of
+    them and at least HELD_ROWS txns before it (Rapid Fire and time_diff_from_last).
+    """
+    lookback = history_lookback() if lookback is None else lookback
+    grouped = flagged.groupby("user_id", sort=False)
+    from_end = grouped.cumcount(ascending=False).to_numpy()  # 0 for a user's last txn
+    held = np.minimum(HELD_ROWS, grouped["user_id"].transform("size").to_numpy())
+    first_held_time = flagged["timestamp"].where(from_end == held - 1).groupby(flagged["user_id"]).transform("first")
+    keep = (flagged["timestamp"] >= first_held_time - lookback).to_numpy() | (from_end < held + HELD_ROWS)
+    return flagged.loc[keep, columns].reset_index(drop=True)
+
+
+# --- Streaming mode ---
+def _prepend_state(state, chunk):
+    """The held rows followed by the chunk.
+
+    pandas warns about concatenating empty or all-NA entries, so empty frames are
+    skipped and a column that is all-NA on one side takes the other side's dtype,
+    which is what concat picked for it anyway.
+    """
+    if state is None or state.empty:
+        return chunk
+    if chunk.empty:
+        return state
+    state = state.astype({c: chunk[c].dtype for c in state.columns if state[c].isna().all()})
+    chunk = chunk.astype({c: state[c].dtype for c in chunk.columns if chunk[c].isna().all()})
+    return pd.concat([state, chunk], ignore_index=True)
+
+
+def _check_sorted(frame):
+    users, times = frame["user_id"], frame["timestamp"]
+    prev_users, prev_times = users.shift(), times.shift()
+    in_order = (users > prev_users) | ((users == prev_users) & ~(times < prev_times))
+    if not in_order.iloc[1:].all():
+        raise ValueError("Streaming mode expects a CSV input sorted by user_id, timestamp, or a Parquet "
+                         "dataset whose every file is sorted by user_id (as the generators write it).")
+
+
+def detect_fraud_streaming(input_path=INPUT_FILE, output_path=OUTPUT_FILE, chunksize=500_000,
+                           profiles_path=PROFILES_FILE):
+    """Runs detect_fraud() over the input in chunks, writing flagged rows as they are final.
+
+    The chunks come in user_id, timestamp order (see pipeline_io.iter_user_frames(); CSV
+    input must already be sorted that way), so only the user spanning a chunk boundary
+    carries state: their recent rows are prepended to the next chunk, and their last
+    HELD_ROWS rows are only written once the next chunk has been scored. Output is
+    identical to the in-memory run. The user profiles are built up chunk by chunk and
+    saved at the end.
+    """
+    profiles = UserProfiles()
+    state, held = None, 0
+    rows_written, part = 0, 0
+    derived = file_format(output_path) == "csv"
+    clear_output(output_path)
+    for chunk in iter_user_frames(input_path, chunksize):
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+        frame = _prepend_state(state, chunk)
+        _check_sorted(frame)
+
+        flagged = detect_fraud(frame)
+        if derived:
+            add_derived_columns(flagged)  # before slicing, so the first rows see the held ones
+        start = 0 if state is None else len(state) - held
+        user_rows = int((flagged["user_id"] == flagged["user_id"].iat[-1]).sum())  # contiguous at the end
+        state = _user_state(flagged.iloc[len(flagged) - user_rows:], chunk.columns)
+        held = min(HELD_ROWS, user_rows)
+
+        ready = flagged.iloc[start:len(flagged) - held]
+        export(ready, output_path, part)
+        rows_written, part = rows_written + len(ready), part + 1
+        profiles.update(chunk)
+
+    if state is not None and held:
+        export(flagged.iloc[len(flagged) - held:], output_path, part)
+        rows_written += held
+    profiles.save(profiles_path)
+    return rows_written
+
+
+# --- Incremental mode ---
+def load_state(path=STATE_FILE):
+    """Per-user history saved by the last incremental run, or None before the first run."""
+    if not os.path.exists(path):
+        return None
+    state = pd.read_csv(path, float_precision="round_trip")
+    state['timestamp'] = pd.to_datetime(state['timestamp'])
+    if LAST_SEEN_COLUMN in state:
+        state[LAST_SEEN_COLUMN] = pd.to_datetime(state[LAST_SEEN_COLUMN])
+    return state
+
+
+def detect_fraud_incremental(df, state_path=STATE_FILE, profiles_path=PROFILES_FILE,
+                             threshold=FRAUD_SCORE_THRESHOLD):
+    """Scores only the txns newer than the last run's watermark and saves the new state and profiles.
+
+    The state file holds each user's recent txns (see _user_state); its latest
+    timestamp is the watermark. Rules that read the user profiles need no rows beyond
+    those: the new txns look up when their user last used their location in the
+    profiles, and the state keeps that lookup for every row it holds. Returns the rows
+    to upsert: the new txns plus the re-scored last HELD_ROWS txns of every user with
+    new activity, since Rapid Fire can flag those retroactively. Without a state file,
+    or if it was saved with another threshold, the whole input is scored and the
+    profiles are rebuilt from it.
+    """
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    columns = [column for column in df.columns if column != LAST_SEEN_COLUMN] + [LAST_SEEN_COLUMN]
+    state = load_state(state_path)
+    if state is not None:
+        saved = state.pop(THRESHOLD_COLUMN).max() if THRESHOLD_COLUMN in state else FRAUD_SCORE_THRESHOLD
+        if saved != threshold:
+            print(f"🔁 Fraud threshold changed from {saved} to {threshold}; rescoring all transactions.")
+            state = None
+    profiles = None if state is None else UserProfiles.load(profiles_path)
+    if profiles is None:
+        # State files from before the profiles existed hold New Location's whole lookback
+        profiles = UserProfiles() if state is None else UserProfiles.from_transactions(state)
+
+    if state is None:
+        history = df.iloc[:0].assign(_emit=False)
+        new = df
+    else:
+        watermark = state['timestamp'].max()
+        new = df[df['timestamp'] > watermark]
+        if len(new) < len(df):
+            print(f"⏭️ Skipping {len(df) - len(new)} txns at or before the watermark {watermark} (already scored).")
+        history = state[state['user_id'].isin(new['user_id'])]
+        history = history.assign(_emit=history.groupby("user_id").cumcount(ascending=False) < HELD_ROWS)
+
+    new = new.assign(_emit=True, **{LAST_SEEN_COLUMN: profiles.location_last_seen(new["user_id"], new["location"])})
+    flagged = detect_fraud(pd.concat([history, new], ignore_index=True), threshold)
+    emit = flagged.pop("_emit").to_numpy(dtype=bool)
+    flagged[LAST_SEEN_COLUMN] = location_last_seen(flagged)
+    profiles.update(new.drop(columns=["_emit", LAST_SEEN_COLUMN])).save(profiles_path)
+
+    touched = _user_state(flagged, columns, history_lookback(profiles=True))
+    if state is not None:
+        untouched = state[~state['user_id'].isin(touched['user_id'])]
+        if len(untouched):  # pandas warns about concatenating empty frames
+            touched = pd.concat([untouched, touched], ignore_index=True)
+    touched = touched.sort_values(by=["user_id", "timestamp"], kind="stable")
+    touched.assign(**{THRESHOLD_COLUMN: threshold}).to_csv(state_path, index=False)
+
+    add_derived_columns(flagged)  # before dropping the history rows they are computed from
+    return flagged[emit].drop(columns=LAST_SEEN_COLUMN).reset_index(drop=True)
+
+
+# --- Parallel mode ---
+def detect_fraud_parallel(df, workers=None):
+    """Runs detect_fraud() on `workers` processes, with transactions hash-partitioned by user_id.
+
+    Every rule only looks at one user's history, so each shard is independent. A user's
+    rows stay together in one shard and keep their serial order, so a stable sort on
+    user_id after concatenating the shards reproduces the serial output exactly.
+    """
+    workers = workers or os.cpu_count()
+    df = compact_transactions(df)  # also makes the shards cheaper to send to the workers
+    shard_of = pd.util.hash_pandas_object(df["user_id"], index=False).to_numpy() % workers
+    shards = [df[shard_of == shard] for shard in range(workers)]
+    shards = [shard for shard in shards if len(shard)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        flagged = list(pool.map(detect_fraud, shards))
+
+    merged = pd.concat(flagged, ignore_index=True)
+    return merged.sort_values("user_id", kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flag suspicious transactions.")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--chunksize", type=int,
+                      help="Stream the input in chunks of this many rows instead of loading it all "
+                           "(input must be sorted by user_id, timestamp).")
+    mode.add_argument("--workers", type=int,
+                      help="Run detection on this many processes, sharded by user_id.")
+    mode.add_argument("--incremental", action="store_true",
+                      help=f"Only score txns newer than the last incremental run (state in {STATE_FILE}).")
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--profiles", default=PROFILES_FILE,
+                        help="User profiles file, rebuilt by a full run and updated by --incremental.")
+    args = parser.parse_args()
+
+    if args.chunksize:
+        detect_fraud_streaming(args.input, args.output, args.chunksize, args.profiles)
+    elif args.workers:
+        df = detect_fraud_parallel(read_transactions(args.input), args.workers)
+        export(df, args.output)
+        UserProfiles.from_transactions(df).save(args.profiles)
+    elif args.incremental:
+        df = detect_fraud_incremental(read_transactions(args.input), args.state, args.profiles)
+        export(df, args.output)
+        print(f"🔁 Scored {len(df)} new or updated transactions.")
+    else:
+        df = detect_fraud(read_transactions(args.input))
+        export(df, args.output)
+        UserProfiles.from_transactions(df).save(args.profiles)
+    print(f"✅ Saved: {args.output}")
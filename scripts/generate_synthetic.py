@@ -0,0 +1,294 @@
+# scripts/generate_synthetic.py (Vectorized, sharded generator for load tests)
+#
+# Same users and transactions as generate_users.py / generate_transactions.py, drawn in
+# bulk with NumPy so 10^8 rows take minutes instead of days. Each shard owns a block of
+# users, uses its own deterministic seed and writes its own Parquet or CSV chunk, so the
+# output does not depend on the number of worker processes. Parquet output uses the
+# pipeline's layout (see pipeline_io.py), e.g. synthetic/transactions.parquet can be
+# passed straight to detect_fraud.py --input.
+#
+#   python scripts/generate_synthetic.py --transactions 100000000 --workers 8
+#   python scripts/generate_synthetic.py --transactions 200000 --format csv --output-dir load_test
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from generate_transactions import CHANNELS, LOCATIONS, MERCHANTS, TYPES
+from generate_users import account_types, email_domains, provinces
+from pipeline_io import TRANSACTIONS, USERS, clear_output, data_path, write_frame
+
+OUTPUT_DIR = "synthetic"
+SHARD_ROWS = 1_000_000   # transactions per shard, and so per output chunk
+TXNS_PER_USER = 6.5      # average; every user gets at least MIN_TXNS_PER_USER like the original 3-10
+MIN_TXNS_PER_USER = 3
+FIRST_TXN_ID = 20000
+FIRST_USER_ID = 1001
+HISTORY_DAYS = 60
+NAME_POOL_SIZE = 1000
+
+# Same scenarios as generate_transactions.py; the original draws one of them uniformly
+# for 0.5% of txns
+FRAUD_SCENARIOS = [
+    "large_withdrawal", "odd_hours", "rapid_fire", "new_location",
+    "card_testing", "offshore_transfer", "excessive_withdrawal_transfer",
+]
+FRAUD_RATE = 0.005
+RECENT_LOCATIONS = 5  # new_location picks a location unused in the user's last 5 txns
+
+DEBIT_TYPES = ["Purchase", "Withdrawal", "Transfer", "Fare"]
+EXTRA_MERCHANTS = ["Unusual ATM", "Card Testing Shop", "Offshore Account", "Suspicious ATM", "Unknown Beneficiary"]
+ALL_MERCHANTS = MERCHANTS + EXTRA_MERCHANTS
+
+
+@lru_cache(maxsize=None)
+def _name_pools(seed):
+    """First and last names drawn once per process; full names are combined with NumPy."""
+    fake = Faker('en_US')
+    fake.seed_instance(seed)
+    return (np.array([fake.first_name() for _ in range(NAME_POOL_SIZE)], dtype=object),
+            np.array([fake.last_name() for _ in range(NAME_POOL_SIZE)], dtype=object))
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _shard_count(total_rows, shard_rows):
+    """Number of shards; a remainder too small to give a user MIN_TXNS_PER_USER is folded into the last full shard."""
+    shards, remainder = divmod(total_rows, shard_rows)
+    return shards + (remainder >= MIN_TXNS_PER_USER)
+
+
+def _shard_bounds(shard, total_rows, shard_rows):
+    last = shard == _shard_count(total_rows, shard_rows) - 1
+    rows = total_rows - shard * shard_rows if last else shard_rows
+    users_per_full_shard = max(1, round(shard_rows / TXNS_PER_USER))
+    n_users = max(1, min(round(rows / TXNS_PER_USER), rows // MIN_TXNS_PER_USER))
+    return rows, n_users, FIRST_USER_ID + shard * users_per_full_shard, FIRST_TXN_ID + shard * shard_rows
+
+
+def generate_users(rng, n_users, first_user_id, end, seed):
+    first_names, last_names = _name_pools(seed)
+    names = (first_names[rng.integers(0, NAME_POOL_SIZE, n_users)] + " "
+             + last_names[rng.integers(0, NAME_POOL_SIZE, n_users)])
+    usernames = pd.Series(names).str.lower().str.replace(" ", ".").str.replace("'", "")
+    domains = np.array(email_domains, dtype=object)[rng.integers(0, len(email_domains), n_users)]
+    signup_days = rng.integers(0, 3 * 365 + 1, n_users)
+    return pd.DataFrame({
+        "user_id": np.arange(first_user_id, first_user_id + n_users),
+        "name": names,
+        "email": usernames + "@" + domains,
+        "account_type": _categorical(rng.integers(0, len(account_types), n_users), account_types),
+        "province": _categorical(rng.integers(0, len(provinces), n_users), provinces),
+        "signup_date": (end.astype("datetime64[D]") - signup_days.astype("timedelta64[D]")),
+        "initial_balance": np.round(rng.uniform(1000, 100000, n_users), 2),
+    })
+
+
+def _running_balance(user_start, initial_balance, type_codes, amount):
+    """Balance before and after every txn: a per-user cumulative sum of signed amounts."""
+    sign = np.where(np.isin(type_codes, [TYPES.index(t) for t in DEBIT_TYPES]), -1.0,
+                    np.where(type_codes == TYPES.index("Deposit"), 1.0, 0.0))
+    delta = sign * amount
+    total = np.cumsum(delta)
+    before_user = np.repeat(total[user_start] - delta[user_start], np.diff(np.append(user_start, len(amount))))
+    after = initial_balance + total - before_user
+    return np.round(after - delta, 2), np.round(after, 2)
+
+
+def generate_transactions(rng, users, rows, first_txn_id, end, scenario_rates):
+    """Transactions for `users`, sorted by user_id, timestamp, with fraud scenarios injected."""
+    n_users = len(users)
+    counts = MIN_TXNS_PER_USER + rng.multinomial(rows - MIN_TXNS_PER_USER * n_users, np.full(n_users, 1 / n_users))
+    user_start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    user_idx = np.repeat(np.arange(n_users), counts)
+
+    def same_user_as(k):
+        """Whether each txn belongs to the same user as the txn k rows earlier."""
+        return np.concatenate([np.zeros(k, dtype=bool), user_idx[k:] == user_idx[:-k]])
+
+    amount = np.round(rng.uniform(20, 5000, rows), 2)
+    type_codes = rng.integers(0, len(TYPES), rows)
+    channel_codes = rng.integers(0, len(CHANNELS), rows)
+    location_codes = rng.integers(0, len(LOCATIONS), rows)
+    merchant_codes = rng.integers(0, len(MERCHANTS), rows)
+    # Each user starts somewhere in the last HISTORY_DAYS and then waits 5 min to 1 day per txn
+    gaps = rng.integers(5 * 60, 1440 * 60 + 1, rows)
+
+    rates = np.array([scenario_rates[name] for name in FRAUD_SCENARIOS])
+    scenario = np.full(rows, -1)
+    hit = rng.random(rows) < rates.sum()
+    scenario[hit] = rng.choice(len(FRAUD_SCENARIOS), hit.sum(), p=rates / rates.sum()) if rates.sum() else -1
+    is_scenario = {name: scenario == i for i, name in enumerate(FRAUD_SCENARIOS)}
+
+    sel = is_scenario["large_withdrawal"]
+    type_codes[sel] = TYPES.index("Withdrawal")
+    amount[sel] = np.round(rng.uniform(55000, 150000, sel.sum()), 2)
+    merchant_codes[sel] = ALL_MERCHANTS.index("Unusual ATM")
+    channel_codes[sel] = CHANNELS.index("ATM")
+
+    # Rapid fire: the user's next 2 txns follow within 5-100 seconds each
+    burst = np.zeros(rows, dtype=bool)
+    for k in (1, 2):
+        follows = np.zeros(rows, dtype=bool)
+        follows[k:] = is_scenario["rapid_fire"][:-k]
+        burst |= follows & same_user_as(k)
+    gaps[burst] = rng.integers(5, 101, burst.sum())
+    amount[burst] = np.round(rng.uniform(50, 500, burst.sum()), 2)
+    type_codes[burst] = np.array([TYPES.index("Purchase"), TYPES.index("Transfer")])[rng.integers(0, 2, burst.sum())]
+    channel_codes[burst] = np.array([CHANNELS.index("POS"), CHANNELS.index("Online")])[rng.integers(0, 2, burst.sum())]
+
+    sel = np.flatnonzero(is_scenario["new_location"])
+    seen = np.zeros((len(sel), len(LOCATIONS)), dtype=bool)
+    for k in range(1, RECENT_LOCATIONS + 1):
+        earlier = (sel >= k) & (user_idx[sel - k] == user_idx[sel])
+        seen[earlier, location_codes[sel[earlier] - k]] = True
+    pick = rng.random(seen.shape) - seen  # any unseen location beats every seen one
+    location_codes[sel] = pick.argmax(axis=1)
+
+    sel = is_scenario["card_testing"]
+    type_codes[sel] = TYPES.index("Purchase")
+    amount[sel] = 10.00
+    merchant_codes[sel] = ALL_MERCHANTS.index("Card Testing Shop")
+    channel_codes[sel] = CHANNELS.index("Online")
+
+    sel = is_scenario["offshore_transfer"]
+    type_codes[sel] = TYPES.index("Transfer")
+    amount[sel] = np.round(rng.uniform(10000, 20000, sel.sum()), 2)
+    merchant_codes[sel] = ALL_MERCHANTS.index("Offshore Account")
+    channel_codes[sel] = CHANNELS.index("App")
+
+    initial_balance = users["initial_balance"].to_numpy()[user_idx]
+    balance_before, _ = _running_balance(user_start, initial_balance, type_codes, amount)
+
+    # Legitimate withdrawals and transfers stay within the balance, as in the original
+    sel = np.isin(type_codes, [TYPES.index("Withdrawal"), TYPES.index("Transfer")]) & (scenario == -1) \
+        & ~burst & (amount > balance_before)
+    cap = np.maximum(20, balance_before[sel] * 0.8)
+    amount[sel] = np.where(balance_before[sel] > 0, np.round(rng.uniform(20, cap), 2), 0)
+
+    sel = is_scenario["excessive_withdrawal_transfer"]
+    bal = balance_before[sel]
+    type_codes[sel] = np.array([TYPES.index("Withdrawal"), TYPES.index("Transfer")])[rng.integers(0, 2, sel.sum())]
+    amount[sel] = np.round(rng.uniform(np.where(bal > 1000, bal * 1.5, 1000), np.where(bal > 1000, bal * 3 + 1000, 5000)), 2)
+    merchant_codes[sel] = np.where(type_codes[sel] == TYPES.index("Withdrawal"),
+                                   ALL_MERCHANTS.index("Suspicious ATM"), ALL_MERCHANTS.index("Unknown Beneficiary"))
+    channel_codes[sel] = np.array([CHANNELS.index("ATM"), CHANNELS.index("Online")])[rng.integers(0, 2, sel.sum())]
+
+    # Per-user clock: a random start plus the running sum of the gaps
+    start = end - np.timedelta64(HISTORY_DAYS, "D") + rng.integers(0, HISTORY_DAYS * 86400, n_users).astype("timedelta64[s]")
+    elapsed = np.cumsum(gaps)
+    elapsed -= np.repeat(elapsed[user_start] - gaps[user_start], counts)
+    timestamp = start[user_idx] + elapsed.astype("timedelta64[s]")
+
+    sel = is_scenario["odd_hours"]
+    day = timestamp[sel].astype("datetime64[D]")
+    odd = np.array([0, 1, 2, 3, 23])[rng.integers(0, 5, sel.sum())] * 3600 + rng.integers(0, 60, sel.sum()) * 60
+    timestamp[sel] = day + odd.astype("timedelta64[s]") + (timestamp[sel] - day) % np.timedelta64(60, "s")
+
+    order = np.lexsort((timestamp, user_idx))  # odd_hours can move a txn before earlier ones
+    user_idx, timestamp, amount = user_idx[order], timestamp[order], amount[order]
+    type_codes, channel_codes = type_codes[order], channel_codes[order]
+    location_codes, merchant_codes = location_codes[order], merchant_codes[order]
+    balance_before, balance_after = _running_balance(user_start, initial_balance, type_codes, amount)
+
+    return pd.DataFrame({
+        "transaction_id": np.arange(first_txn_id, first_txn_id + rows),
+        "user_id": users["user_id"].to_numpy()[user_idx],
+        "timestamp": timestamp,
+        "amount": amount,
+        "type": _categorical(type_codes, TYPES),
+        "channel": _categorical(channel_codes, CHANNELS),
+        "location": _categorical(location_codes, LOCATIONS),
+        "merchant": _categorical(merchant_codes, ALL_MERCHANTS),
+        "balance_before_txn": balance_before,
+        "balance_after_txn": balance_after,
+    })
+
+
+def output_path(output_dir, stem, fmt):
+    """Parquet shards are parts of one dataset per table; CSV shards are files in a directory per table."""
+    return os.path.join(output_dir, data_path(stem, "parquet") if fmt == "parquet" else stem)
+
+
+def write_chunk(df, output_dir, stem, fmt, shard):
+    if fmt == "parquet":
+        write_frame(df, output_path(output_dir, stem, fmt), part=shard)
+    else:
+        df.to_csv(os.path.join(output_path(output_dir, stem, fmt), f"part-{shard:05d}.csv"), index=False)
+
+
+def generate_shard(shard, total_rows, shard_rows, output_dir, fmt, seed, end, scenario_rates):
+    """Generates and writes one shard; returns its (users, transactions) row counts."""
+    rng = np.random.default_rng([seed, shard])
+    rows, n_users, first_user_id, first_txn_id = _shard_bounds(shard, total_rows, shard_rows)
+    users = generate_users(rng, n_users, first_user_id, end, seed)
+    transactions = generate_transactions(rng, users, rows, first_txn_id, end, scenario_rates)
+    write_chunk(users, output_dir, USERS, fmt, shard)
+    write_chunk(transactions, output_dir, TRANSACTIONS, fmt, shard)
+    return n_users, rows
+
+
+def generate(total_rows, output_dir=OUTPUT_DIR, fmt="parquet", shard_rows=SHARD_ROWS, workers=None,
+             seed=123, end=None, scenario_rates=None):
+    """Writes `total_rows` transactions (and their users) as one chunk per shard under output_dir."""
+    if total_rows < MIN_TXNS_PER_USER:
+        raise ValueError(f"Generate at least {MIN_TXNS_PER_USER} transactions, one user's worth.")
+    if shard_rows < MIN_TXNS_PER_USER:
+        raise ValueError(f"Shards need at least {MIN_TXNS_PER_USER} transactions, one user's worth.")
+    end = np.datetime64(end or datetime.now().replace(microsecond=0), "s")
+    scenario_rates = scenario_rates or {name: FRAUD_RATE / len(FRAUD_SCENARIOS) for name in FRAUD_SCENARIOS}
+    for stem in (USERS, TRANSACTIONS):
+        path = output_path(output_dir, stem, fmt)
+        clear_output(path)
+        os.makedirs(path)
+
+    shards = range(_shard_count(total_rows, shard_rows))
+    job = partial(generate_shard, total_rows=total_rows, shard_rows=shard_rows, output_dir=output_dir,
+                  fmt=fmt, seed=seed, end=end, scenario_rates=scenario_rates)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        counts = list(pool.map(job, shards))
+    return sum(n for n, _ in counts), sum(rows for _, rows in counts)
+
+
+def parse_scenario_rates(fraud_rate, overrides):
+    rates = {name: fraud_rate / len(FRAUD_SCENARIOS) for name in FRAUD_SCENARIOS}
+    for override in overrides:
+        name, _, rate = override.partition("=")
+        if name not in rates:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; choose from {', '.join(FRAUD_SCENARIOS)}")
+        rates[name] = float(rate)
+    return rates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate large synthetic users and transactions.")
+    parser.add_argument("--transactions", type=int, default=SHARD_ROWS, help="Number of transactions to generate.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS,
+                        help="Transactions per shard; each shard is written as its own chunk.")
+    parser.add_argument("--workers", type=int, help="Processes to generate shards on (default: all cores).")
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("--end", help="The 'now' that each user's history starts up to HISTORY_DAYS before, e.g. 2025-07-01 "
+                             "(default: the current time).")
+    parser.add_argument("--fraud-rate", type=float, default=FRAUD_RATE,
+                        help="Share of txns turned into a fraud scenario, split evenly across scenarios.")
+    parser.add_argument("--scenario-rate", action="append", default=[], metavar="NAME=RATE",
+                        help=f"Override one scenario's rate ({', '.join(FRAUD_SCENARIOS)}).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    n_users, n_rows = generate(args.transactions, args.output_dir, args.format, args.shard_rows, args.workers,
+                               args.seed, args.end, parse_scenario_rates(args.fraud_rate, args.scenario_rate))
+    elapsed = time.perf_counter() - started
+    print(f"✅ Generated {n_users} users and {n_rows} transactions in {elapsed:.1f}s "
+          f"({n_rows / elapsed:,.0f} rows/s) under {args.output_dir}/")
@@ -5,6 +5,8 @@ from faker import Faker
 import random
 from datetime import timedelta
 
+from pipeline_io import TRANSACTIONS, USERS, data_path, read_frame, write_frame
+
 fake = Faker('en_US')
 Faker.seed(123) 
 
@@ -20,10 +22,11 @@ LOCATIONS = [
     "Kimberley, NC", "Gqeberha, EC", "Potchefstroom, NW", "Mbombela, MP"
 ]
 
-def generate_transactions(n=500, users_file="users.csv"):
-    users_df = pd.read_csv(users_file)
+def generate_transactions(n=500, users_file=None, users_df=None):
+    if users_df is None:
+        users_df = read_frame(users_file or data_path(USERS))
     # Map user_id to their initial balance for tracking
-    user_balances_tracker = {user['user_id']: user['initial_balance'] for index, user in users_df.iterrows()}
+    user_balances_tracker = dict(zip(users_df['user_id'], users_df['initial_balance']))
 
     transactions = []
     txn_id = 20000
@@ -152,8 +155,10 @@ def generate_transactions(n=500, users_file="users.csv"):
         "transaction_id", "user_id", "timestamp", "amount", "type",
         "channel", "location", "merchant", "balance_before_txn", "balance_after_txn" # New columns
     ])
-    df.to_csv("transactions.csv", index=False)
-    print(f"✅ Generated {len(df)} transactions and saved to transactions.csv")
+    path = data_path(TRANSACTIONS)
+    write_frame(df, path)
+    print(f"✅ Generated {len(df)} transactions and saved to {path}")
+    return df
 
 if __name__ == "__main__":
     generate_transactions()
\ No newline at end of file
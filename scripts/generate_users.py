@@ -4,6 +4,8 @@ import pandas as pd
 from faker import Faker
 import random
 
+from pipeline_io import USERS, data_path, write_frame
+
 # Use en_US and manually customize for SA context
 fake = Faker('en_US')
 Faker.seed(42) # Keeping your seed for reproducibility
@@ -33,8 +35,10 @@ def generate_users(n=50): # Recommended: Increased default from 10 to 50 for mor
     df = pd.DataFrame(users, columns=[
         "user_id", "name", "email", "account_type", "province", "signup_date", "initial_balance" # Added initial_balance
     ])
-    df.to_csv("users.csv", index=False)
-    print(f"✅ Generated {n} users and saved to users.csv")
+    path = data_path(USERS)
+    write_frame(df, path)
+    print(f"✅ Generated {n} users and saved to {path}")
+    return df
 
 if __name__ == "__main__":
     generate_users(n=50) # Call with 50 users by default as recommended
\ No newline at end of file
@@ -1,12 +1,20 @@
 # scripts/load_to_postgres.py
 
-import pandas as pd
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 import os
 import urllib.parse
 from dotenv import load_dotenv
 
+from partitions import (apply_retention, build_partition, create_partitions, ensure_schema, retention_cutoff,
+                        staged_months, swap_partitions)
+from pipeline_io import FLAGGED_TRANSACTIONS, USERS, data_path, open_csv, read_columns
+from refresh_summaries import refresh_summaries
+from user_profiles import PROFILES_FILE, ensure_profiles_table
+
 load_dotenv()
 
 # --- Load environment variables ---
@@ -20,39 +28,191 @@ DB_NAME = os.getenv("POSTGRES_DB", "fnb_fraud_db")
 # --- Create the connection string ---
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-def load_data_to_postgres():
-    print("📦 Starting data loading process...")
+PARTITION_LOAD_WORKERS = int(os.getenv("PARTITION_LOAD_WORKERS", "4"))  # months built at once by a full reload
+
+USERS_FILE = data_path(USERS)
+TRANSACTIONS_FILE = data_path(FLAGGED_TRANSACTIONS)
+
+# (table, CSV file or Parquet dataset, conflict key), in foreign-key order: users before transactions.
+# transactions is partitioned by month (scripts/partitions.py), so its key includes timestamp.
+TABLES = [
+    ("users", USERS_FILE, "user_id"),
+    ("transactions", TRANSACTIONS_FILE, "transaction_id, timestamp"),
+]
+# Loaded too when detect_fraud.py has written it; references users.
+PROFILES_TABLE = ("user_profiles", PROFILES_FILE, "user_id")
+
+
+def _table_columns(cur, table):
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+    return {row[0] for row in cur.fetchall()}
+
+
+def ensure_unique_key(conn, table, key):
+    """ON CONFLICT (key) needs a unique index on key; add one unless a primary key or unique index exists."""
+    exists = conn.execute(text("""
+        SELECT 1 FROM pg_indexes
+        WHERE tablename = :table AND indexdef LIKE 'CREATE UNIQUE INDEX%' AND indexdef LIKE :columns
+    """), {"table": table, "columns": f"%({key})"}).first()
+    if not exists:
+        conn.execute(text(f"CREATE UNIQUE INDEX {table}_{key}_key ON {table} ({key})"))
 
+
+def copy_to_staging(engine, table, path):
+    """Streams a file into an UNLOGGED `{table}_staging` table with COPY FROM STDIN.
+
+    Parquet is converted to CSV batch by batch on the way in. The staging table is shaped like `table`, plus TEXT columns for anything in the
+    file that the table does not have. Returns (rows copied, seconds taken).
+    """
+    start = time.perf_counter()
+    staging = f"{table}_staging"
+    header = read_columns(path)
+
+    conn = engine.raw_connection()
     try:
-        users_df = pd.read_csv("users.csv")
-        txn_df = pd.read_csv("transactions_with_fraud_flags.csv")
-        print("✅ CSVs loaded into DataFrames.")
-    except FileNotFoundError as e:
-        print(f"❌ CSV missing: {e}")
-        return
-    except Exception as e:
-        print(f"❌ Error reading CSVs: {e}")
-        return
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+            cur.execute(f"CREATE UNLOGGED TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+            for column in set(header) - _table_columns(cur, table):
+                cur.execute(f'ALTER TABLE {staging} ADD COLUMN "{column}" TEXT')
+
+            columns = ", ".join(f'"{c}"' for c in header)
+            with open_csv(path) as f:
+                cur.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)", f,
+                                size=1 << 20)
+            rows = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return rows, time.perf_counter() - start
+
+
+def merge_from_staging(conn, table, key, columns):
+    """Upserts `{table}_staging` into `table`, leaving rows that did not change untouched."""
+    staging = f"{table}_staging"
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    values = [c for c in columns if c not in key.split(", ")]
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in values)
+    current = ", ".join(f'{table}."{c}"' for c in values)
+    incoming = ", ".join(f'EXCLUDED."{c}"' for c in values)
+    conn.execute(text(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging}
+        ON CONFLICT ({key}) DO UPDATE SET {updates}
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """))
+
+
+def delete_missing_from_staging(conn, table, key):
+    """Deletes the rows of `table` whose key is not in `{table}_staging`."""
+    conn.execute(text(f"""
+        DELETE FROM {table} t
+        WHERE NOT EXISTS (SELECT 1 FROM {table}_staging s WHERE s.{key} = t.{key})
+    """))
+
+
+def merge_columns(conn, table, path):
+    """Columns of `path` to write into `table`: the ones it stores.
+
+    CSV output also has rules_applied and detect_fraud.py's derived columns for people
+    reading the file. Rule hits are stored as the integer rules_mask; the API turns them
+    back into names.
+    """
+    stored = set(conn.execute(text("SELECT column_name FROM information_schema.columns "
+                                   "WHERE table_name = :table"), {"table": table}).scalars())
+    return [c for c in read_columns(path) if c in stored]
+
+
+def drop_expired_from_staging(conn, cutoff):
+    """Deletes staged transactions older than the retention cutoff, so a load never brings them back."""
+    if cutoff is None:
+        return 0
+    return conn.execute(text("DELETE FROM transactions_staging WHERE timestamp < :cutoff"), {"cutoff": cutoff}).rowcount
+
+
+def load_data_to_postgres(upsert=False):
+    """Loads the users and flagged transactions files through COPY staging tables.
+
+    Both files are copied into staging tables in parallel and users are merged with
+    INSERT ... ON CONFLICT. A full reload (the default) then builds every month of
+    transactions as a new, indexed table, several months at once, and swaps them in as
+    the month partitions in one transaction together with deleting users that are no
+    longer in the file. Readers keep seeing the old data until that commit, instead of
+    an empty table after a TRUNCATE. With upsert=True (after an incremental detection
+    run) transactions are merged through the partitioned table and nothing is deleted.
+    Expired months are detached (or dropped) first and older rows in the files are skipped.
+    The user profiles file, if there is one, is merged in the same transaction as the
+    transactions.
+    """
+    print("📦 Starting data loading process...")
+
+    for _, path, _ in TABLES:
+        if not os.path.exists(path):
+            print(f"❌ File missing: {path}")
+            return
+    tables = TABLES + [PROFILES_TABLE] if os.path.exists(PROFILES_TABLE[1]) else TABLES
 
     try:
         print(f"🔌 Connecting to PostgreSQL at {DB_HOST}:{DB_PORT}/{DB_NAME} as {DB_USER}...")
-        engine = create_engine(DATABASE_URL)
+        engine = create_engine(DATABASE_URL, pool_size=PARTITION_LOAD_WORKERS)
+
+        if ensure_schema(engine):
+            print("🗂️ Converted transactions into a table partitioned by month.")
+        with engine.begin() as conn:
+            ensure_unique_key(conn, "users", "user_id")
+            ensure_profiles_table(conn)
+            # Before the load, so a full reload's swap never empties a month that is about to be detached
+            for name in apply_retention(conn):
+                print(f"🧹 Retention: removed {name} from transactions.")
+
+        # --- COPY every file into a staging table in parallel ---
+        with ThreadPoolExecutor(max_workers=len(tables)) as pool:
+            copies = {table: pool.submit(copy_to_staging, engine, table, path) for table, path, _ in tables}
+        for table, copy in copies.items():
+            rows, seconds = copy.result()
+            print(f"📥 Copied {rows:,} rows into {table}_staging in {seconds:.1f}s "
+                  f"({rows / max(seconds, 1e-9):,.0f} rows/s).")
 
-        # --- Truncate tables safely before loading ---
+        start = time.perf_counter()
         with engine.begin() as conn:
-            conn.execute(text("TRUNCATE TABLE transactions RESTART IDENTITY CASCADE"))
-            conn.execute(text("TRUNCATE TABLE users RESTART IDENTITY CASCADE"))
-            print("🧹 Tables truncated successfully.")
+            expired = drop_expired_from_staging(conn, retention_cutoff())
+            columns = {table: merge_columns(conn, table, path) for table, path, _ in tables}
+            # Committed before the partitions are built, so their foreign keys see every new user
+            merge_from_staging(conn, "users", "user_id", columns["users"])
+            months = staged_months(conn, "transactions_staging")
+        if expired:
+            print(f"🧹 Skipped {expired:,} transactions older than the retention policy.")
 
-        # --- Load users ---
-        print("📥 Loading users into 'users' table...")
-        users_df.to_sql("users", engine, if_exists="append", index=False)
-        print("✅ Users table loaded.")
+        if upsert:
+            # --- Merge into the live tables; Postgres routes each row to its month ---
+            with engine.begin() as conn:
+                create_partitions(conn, months)
+                merge_from_staging(conn, "transactions", "transaction_id, timestamp", columns["transactions"])
+                if "user_profiles" in columns:
+                    merge_from_staging(conn, "user_profiles", "user_id", columns["user_profiles"])
+                for table, _, _ in tables:
+                    conn.execute(text(f"DROP TABLE {table}_staging"))
+        else:
+            # --- Build each month as a new partition in parallel, then swap them all in at once ---
+            with ThreadPoolExecutor(max_workers=PARTITION_LOAD_WORKERS) as pool:
+                builds = {month: pool.submit(build_partition, engine, "transactions_staging", month,
+                                             columns["transactions"]) for month in months}
+            built = {month: build.result()[0] for month, build in builds.items()}
+            print(f"🧱 Built {len(built)} monthly partitions in {time.perf_counter() - start:.1f}s.")
+            with engine.begin() as conn:
+                swap_partitions(conn, built)
+                if "user_profiles" in columns:
+                    merge_from_staging(conn, "user_profiles", "user_id", columns["user_profiles"])
+                    delete_missing_from_staging(conn, "user_profiles", "user_id")
+                delete_missing_from_staging(conn, "users", "user_id")
+                for table, _, _ in tables:
+                    conn.execute(text(f"DROP TABLE {table}_staging"))
+        total_rows = sum(copy.result()[0] for copy in copies.values()) - expired
+        seconds = time.perf_counter() - start
+        print(f"🔀 Merged {total_rows:,} rows in {seconds:.1f}s ({total_rows / max(seconds, 1e-9):,.0f} rows/s).")
 
-        # --- Load transactions ---
-        print("📥 Loading transactions into 'transactions' table...")
-        txn_df.to_sql("transactions", engine, if_exists="append", index=False)
-        print("✅ Transactions table loaded.")
+        seconds = refresh_summaries(engine)
+        print(f"📊 Refreshed fraud summaries in {seconds:.1f}s.")
 
         print("🎉 All data loaded into PostgreSQL!")
 
@@ -61,5 +221,11 @@ def load_data_to_postgres():
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
 
+
 if __name__ == "__main__":
-    load_data_to_postgres()
+    parser = argparse.ArgumentParser(description="Load users and flagged transactions into PostgreSQL.")
+    parser.add_argument("--upsert", action="store_true",
+                        help="Only insert/update rows from the files; keep rows that are not in them.")
+    args = parser.parse_args()
+
+    load_data_to_postgres(upsert=args.upsert)
@@ -0,0 +1,329 @@
+# scripts/partitions.py
+#
+# Schema management for the transactions table, which is range-partitioned by month on
+# timestamp. Date-filtered queries only touch the months they ask for, every partition
+# has its own small indexes, a full reload replaces whole months by swapping in freshly
+# built partitions, and old months are detached or dropped as a whole.
+#
+#   python scripts/partitions.py                        # create missing tables and upcoming months
+#   python scripts/partitions.py --retention-months 12  # also detach months older than a year
+
+import argparse
+import os
+import re
+import urllib.parse
+from datetime import date
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+load_dotenv()
+
+# --- Load environment variables ---
+DB_USER = os.getenv("POSTGRES_USER", "postgres")
+DB_PASSWORD = urllib.parse.quote_plus(os.getenv("POSTGRES_PASSWORD", "Admin@1234"))
+DB_HOST = os.getenv("POSTGRES_HOST", "localhost")
+DB_PORT = os.getenv("POSTGRES_PORT", "5432")
+DB_NAME = os.getenv("POSTGRES_DB", "fnb_fraud_db")
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))  # empty partitions kept ready
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "0"))  # full months kept before the current one; 0 keeps all
+RETENTION_ACTION = os.getenv("RETENTION_ACTION", "detach")  # "detach" keeps expired months as plain tables
+RETENTION_ACTIONS = ["detach", "drop"]
+
+USERS_DDL = """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY, name TEXT, email TEXT, account_type TEXT, province TEXT,
+        signup_date DATE, initial_balance DOUBLE PRECISION)
+"""
+
+TRANSACTIONS_COLUMNS = [
+    ("transaction_id", "BIGINT NOT NULL"), ("user_id", "INTEGER"), ("timestamp", "TIMESTAMP NOT NULL"),
+    ("amount", "DOUBLE PRECISION"), ("type", "TEXT"), ("channel", "TEXT"), ("location", "TEXT"),
+    ("merchant", "TEXT"), ("balance_before_txn", "DOUBLE PRECISION"), ("balance_after_txn", "DOUBLE PRECISION"),
+    ("is_fraud", "INTEGER"), ("rules_mask", "BIGINT"), ("fraud_score", "INTEGER"),
+]
+# Columns earlier schemas declared but no load ever filled: rules_applied is stored as rules_mask,
+# and detect_fraud.py's derived columns are recomputed from timestamp when needed
+UNSTORED_COLUMNS = ["rules_applied", "time_diff_from_last", "hour"]
+# Unique keys of a partitioned table must include the partition column
+PRIMARY_KEY = "transaction_id, timestamp"
+
+# Indexes the API queries rely on: newest-first keyset pages, per-user history and the fraud
+# list. Created on the parent, so every partition gets its own copy.
+INDEXES = {
+    "transactions_timestamp_id_idx": "(timestamp, transaction_id)",
+    "transactions_user_timestamp_idx": "(user_id, timestamp)",
+    "transactions_fraud_timestamp_idx": "(timestamp, transaction_id) WHERE is_fraud = 1",
+}
+
+# Index names of one month's partition; index names are unique per schema, so the
+# partition swap renames a built table's indexes along with the table.
+PARTITION_INDEXES = {"pkey": None} | {name.removeprefix("transactions_"): columns for name, columns in INDEXES.items()}
+
+NAME_LENGTH = 63  # longest identifier Postgres keeps
+
+PARTITION_NAME = re.compile(r"^transactions_y(\d{4})m(\d{2})$")
+
+
+# --- Months ---
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"transactions_y{month:%Y}m{month:%m}"
+
+
+def partition_bounds(month):
+    return f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+
+
+def upcoming_months(today=None):
+    """The current month and the PARTITION_MONTHS_AHEAD after it."""
+    current = month_start(today or date.today())
+    return [add_months(current, ahead) for ahead in range(PARTITION_MONTHS_AHEAD + 1)]
+
+
+def retention_cutoff(months=RETENTION_MONTHS, today=None):
+    """First day of the oldest month kept: the current month plus `months` full months before it.
+
+    None when months is 0, which keeps everything.
+    """
+    if months <= 0:
+        return None
+    return add_months(month_start(today or date.today()), -months)
+
+
+# --- Partitions ---
+def attached_partitions(conn, parent="transactions"):
+    """Month -> name of every monthly partition attached to `parent`."""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:parent)
+    """), {"parent": parent}).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def name_partition_indexes(conn, partition):
+    """Renames the indexes Postgres created for a partition to the names swap_partitions() gives them."""
+    indexes = conn.execute(text("""
+        SELECT c.relname, p.relname FROM pg_index x
+        JOIN pg_class c ON c.oid = x.indexrelid
+        JOIN pg_inherits i ON i.inhrelid = x.indexrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE x.indrelid = to_regclass(:partition)
+    """), {"partition": partition}).all()
+    for index, parent_index in indexes:
+        name = f"{partition}_{parent_index.removeprefix('transactions_')}"
+        if index != name:
+            conn.execute(text(f"ALTER INDEX {index} RENAME TO {name}"))
+
+
+def create_partitions(conn, months, parent="transactions"):
+    """Creates the partitions of `months` that `parent` does not have yet."""
+    existing = attached_partitions(conn, parent)
+    for month in sorted(set(months) - set(existing)):
+        conn.execute(text(f"CREATE TABLE {partition_name(month)} PARTITION OF {parent} "
+                          f"FOR VALUES {partition_bounds(month)}"))
+        name_partition_indexes(conn, partition_name(month))
+
+
+def staged_months(conn, table):
+    """First day of every month with rows in `table`."""
+    return [month.date() for month in conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp) FROM {table} WHERE timestamp IS NOT NULL")).scalars()]
+
+
+# --- Schema ---
+def _create_transactions_table(conn, name):
+    columns = ", ".join(f'"{column}" {definition}' for column, definition in TRANSACTIONS_COLUMNS)
+    conn.execute(text(f"CREATE TABLE {name} ({columns}) PARTITION BY RANGE (timestamp)"))
+
+
+def _add_keys_and_indexes(conn):
+    conn.execute(text(f"ALTER TABLE transactions ADD PRIMARY KEY ({PRIMARY_KEY})"))
+    conn.execute(text("ALTER TABLE transactions ADD FOREIGN KEY (user_id) REFERENCES users (user_id)"))
+    for name, columns in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON transactions {columns}"))
+    for partition in attached_partitions(conn).values():
+        name_partition_indexes(conn, partition)
+
+
+def _partition_existing_table(conn):
+    """Moves the rows of a plain transactions table into a new partitioned one.
+
+    The summary views depend on the old table and are dropped with it;
+    refresh_summaries() recreates them.
+    """
+    _create_transactions_table(conn, "transactions_partitioned")
+    create_partitions(conn, staged_months(conn, "transactions"), parent="transactions_partitioned")
+    existing = set(conn.execute(text("SELECT column_name FROM information_schema.columns "
+                                     "WHERE table_name = 'transactions'")).scalars())
+    columns = ", ".join(f'"{column}"' for column, _ in TRANSACTIONS_COLUMNS if column in existing)
+    conn.execute(text(f"INSERT INTO transactions_partitioned ({columns}) SELECT {columns} FROM transactions"))
+    conn.execute(text("DROP TABLE transactions CASCADE"))
+    conn.execute(text("ALTER TABLE transactions_partitioned RENAME TO transactions"))
+    _add_keys_and_indexes(conn)
+
+
+def _drop_unstored_columns(conn):
+    existing = set(conn.execute(text("SELECT column_name FROM information_schema.columns "
+                                     "WHERE table_name = 'transactions'")).scalars())
+    drops = [f'DROP COLUMN "{column}"' for column in UNSTORED_COLUMNS if column in existing]
+    if drops:
+        conn.execute(text(f"ALTER TABLE transactions {', '.join(drops)}"))
+
+
+def ensure_schema(engine):
+    """Creates users and the partitioned transactions table if they are missing, plus upcoming months.
+
+    An existing unpartitioned transactions table is converted in place, in one transaction,
+    and UNSTORED_COLUMNS are dropped from a partitioned one that still has them.
+    Returns True if it had to be converted.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(USERS_DDL))
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')")).scalar()
+        if kind is None:
+            _create_transactions_table(conn, "transactions")
+            _add_keys_and_indexes(conn)
+        elif kind == "r":
+            _partition_existing_table(conn)
+        else:
+            _drop_unstored_columns(conn)
+        create_partitions(conn, upcoming_months())
+    return kind == "r"
+
+
+# --- Partition swaps ---
+def build_partition(engine, source, month, columns):
+    """Copies one month of `source` into a new table that is ready to become its partition.
+
+    The table gets the partitions' keys, indexes and foreign key, plus a CHECK constraint
+    matching the month's bounds, so attaching it needs no validation scan. Runs in its
+    own transaction, so several months can be built at once. Returns (table, rows).
+    """
+    table = f"{partition_name(month)}_load"
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    end = add_months(month, 1)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"CREATE TABLE {table} (LIKE transactions INCLUDING DEFAULTS)"))
+        rows = conn.execute(text(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {source} WHERE timestamp >= :start AND timestamp < :end
+        """), {"start": month, "end": end}).rowcount
+        for suffix, columns_and_predicate in PARTITION_INDEXES.items():
+            if columns_and_predicate is None:
+                conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_{suffix} PRIMARY KEY ({PRIMARY_KEY})"))
+            else:
+                conn.execute(text(f"CREATE INDEX {table}_{suffix} ON {table} {columns_and_predicate}"))
+        conn.execute(text(f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES users (user_id)"))
+        conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_bounds "
+                          f"CHECK (timestamp >= '{month}' AND timestamp < '{end}')"))
+        conn.execute(text(f"ANALYZE {table}"))
+    return table, rows
+
+
+def swap_partitions(conn, built):
+    """Makes tables from build_partition() the partitions of their months, in the caller's transaction.
+
+    `built` maps month -> table. Months already attached are replaced; attached months not
+    in `built` are emptied, so transactions ends up holding exactly the built rows. Every
+    step is a catalog change, so readers are only blocked for the moment of the commit.
+    """
+    current = attached_partitions(conn)
+    for month, table in sorted(built.items()):
+        name = partition_name(month)
+        if month in current:
+            conn.execute(text(f"DROP TABLE {name}"))
+        conn.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {table} FOR VALUES {partition_bounds(month)}"))
+        conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {table}_bounds"))
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {name}"))
+        for suffix in PARTITION_INDEXES:
+            conn.execute(text(f"ALTER INDEX {table}_{suffix} RENAME TO {name}_{suffix}"))
+    for month, name in current.items():
+        if month not in built:
+            conn.execute(text(f"TRUNCATE {name}"))
+
+
+# --- Retention ---
+def apply_retention(conn, months=RETENTION_MONTHS, action=RETENTION_ACTION, today=None):
+    """Detaches or drops the partitions of months before retention_cutoff(). Returns their names.
+
+    Detached months stay in the database as plain tables named ..._detached_<date>, out of
+    every query, until someone archives or drops them.
+    """
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action {action!r}; expected one of {RETENTION_ACTIONS}.")
+    cutoff = retention_cutoff(months, today)
+    if cutoff is None:
+        return []
+    expired = [name for month, name in sorted(attached_partitions(conn).items()) if month < cutoff]
+    for name in expired:
+        if action == "drop":
+            conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            conn.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+            rename_table(conn, name, f"{name}_detached_{today or date.today():%Y%m%d}")
+    return expired
+
+
+def rename_table(conn, name, new_name):
+    """Renames a table together with its indexes and constraints named after it.
+
+    Index names are unique per schema, so a detached month that kept its partition's
+    index names would block that month from ever being created or swapped in again.
+    New names are cut to Postgres' identifier length, as Postgres itself would.
+    """
+    indexes = conn.execute(text("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(:name)"),
+                           {"name": name}).scalars().all()
+    constraints = conn.execute(text("""
+        SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype NOT IN ('p', 'u', 'x')
+    """), {"name": name}).scalars().all()
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {new_name}"))
+    for index in indexes:
+        if index.startswith(f"{name}_"):
+            renamed = (new_name + index.removeprefix(name))[:NAME_LENGTH]
+            conn.execute(text(f"ALTER INDEX {index} RENAME TO {renamed}"))
+    for constraint in constraints:
+        if constraint.startswith(f"{name}_"):
+            renamed = (new_name + constraint.removeprefix(name))[:NAME_LENGTH]
+            conn.execute(text(f"ALTER TABLE {new_name} RENAME CONSTRAINT {constraint} TO {renamed}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the transactions partitions and apply the retention policy.")
+    parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS,
+                        help="Full months kept before the current one; 0 keeps every month (default: RETENTION_MONTHS).")
+    parser.add_argument("--retention-action", choices=RETENTION_ACTIONS, default=RETENTION_ACTION,
+                        help="What happens to expired months (default: RETENTION_ACTION, else detach).")
+    args = parser.parse_args()
+
+    try:
+        engine = create_engine(DATABASE_URL)
+        if ensure_schema(engine):
+            print("🗂️ Converted transactions into a table partitioned by month.")
+        with engine.begin() as conn:
+            expired = apply_retention(conn, args.retention_months, args.retention_action)
+            partitions = attached_partitions(conn)
+        for name in expired:
+            print(f"🧹 {'Dropped' if args.retention_action == 'drop' else 'Detached'} {name}.")
+        print(f"📅 transactions has {len(partitions)} monthly partitions: "
+              f"{', '.join(partitions[month] for month in sorted(partitions))}.")
+    except SQLAlchemyError as e:
+        print(f"❌ SQLAlchemy error: {e}")
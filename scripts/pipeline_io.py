@@ -0,0 +1,235 @@
+# scripts/pipeline_io.py
+#
+# Reading and writing the files passed between pipeline stages. Parquet is the default:
+# typed columns (dictionary-encoded strings, int32 ids, native timestamps), zstd
+# compression and transactions partitioned by date, so a stage only reads and parses
+# what it needs. CSV is still supported for anything that expects the old files.
+# The format follows the file extension; PIPELINE_FORMAT picks the default paths.
+
+import io
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import csv as pa_csv
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PIPELINE_FORMAT = os.getenv("PIPELINE_FORMAT", "parquet")  # "parquet" or "csv"
+FORMATS = ["parquet", "csv"]
+
+USERS = "users"
+TRANSACTIONS = "transactions"
+FLAGGED_TRANSACTIONS = "transactions_with_fraud_flags"
+PROFILES = "user_profiles"
+
+PARTITION_COLUMN = "date"  # hive-style date=YYYY-MM-DD directories, derived from timestamp
+COMPRESSION = "zstd"
+ROW_GROUP_ROWS = 1_000_000  # the dataset writer would otherwise flush a tiny row group per input batch
+COPY_BATCH_ROWS = 100_000  # rows converted to CSV at a time when streaming Parquet into COPY
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+# Arrow type of every column a stage writes; columns not listed keep the inferred type
+COLUMN_TYPES = {
+    "user_id": pa.int32(),
+    "transaction_id": pa.int64(),
+    "timestamp": pa.timestamp("us"),
+    "amount": pa.float64(),
+    "type": _CATEGORY,
+    "channel": _CATEGORY,
+    "location": _CATEGORY,
+    "merchant": _CATEGORY,
+    "balance_before_txn": pa.float64(),
+    "balance_after_txn": pa.float64(),
+    "is_fraud": pa.int8(),
+    "fraud_score": pa.int16(),
+    "rules_mask": pa.int64(),
+    "name": pa.string(),
+    "email": pa.string(),
+    "account_type": _CATEGORY,
+    "province": _CATEGORY,
+    "signup_date": pa.date32(),
+    "initial_balance": pa.float64(),
+    "last_timestamp": pa.timestamp("us"),
+}
+
+
+def data_path(stem, fmt=None):
+    """Default path of a stage's file, e.g. transactions.parquet or transactions.csv."""
+    return f"{stem}.{fmt or PIPELINE_FORMAT}"
+
+
+def file_format(path):
+    return "csv" if path.endswith(".csv") else "parquet"
+
+
+def _to_table(df):
+    frame = df.copy(deep=False)
+    if "signup_date" in frame:
+        frame["signup_date"] = pd.to_datetime(frame["signup_date"]).dt.date
+    if "timestamp" in frame:
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    inferred = pa.Schema.from_pandas(frame, preserve_index=False)
+    schema = pa.schema([(field.name, COLUMN_TYPES.get(field.name, field.type)) for field in inferred])
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def clear_output(path):
+    """Removes a previous CSV file or Parquet dataset at path, if any."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def write_frame(df, path, part=None):
+    """Writes df to a CSV file or a Parquet dataset, replacing what is there.
+
+    Frames with a timestamp column are written as a Parquet dataset partitioned by
+    date, anything else as a single Parquet file. With `part`, df is one chunk of a
+    larger output: Parquet chunks are added to the dataset as their own files (call
+    clear_output() first), CSV chunks after part 0 are appended without a header.
+    """
+    if file_format(path) == "csv":
+        df.to_csv(path, index=False, mode="a" if part else "w", header=not part)
+        return
+
+    table = _to_table(df)
+    if part is None:
+        clear_output(path)
+        if "timestamp" not in df:
+            pq.write_table(table, path, compression=COMPRESSION)
+            return
+
+    os.makedirs(path, exist_ok=True)
+    basename = f"part-{part or 0:05d}-{{i}}.parquet"
+    if "timestamp" not in df or len(df) == 0:
+        pq.write_table(table, os.path.join(path, basename.format(i=0)), compression=COMPRESSION)
+        return
+    dates = pc.strftime(table["timestamp"], "%Y-%m-%d")
+    ds.write_dataset(table.append_column(PARTITION_COLUMN, dates), path, format="parquet",
+                     partitioning=[PARTITION_COLUMN], partitioning_flavor="hive",
+                     basename_template=basename, existing_data_behavior="overwrite_or_ignore",
+                     min_rows_per_group=ROW_GROUP_ROWS, max_rows_per_group=ROW_GROUP_ROWS,
+                     file_options=ds.ParquetFileFormat().make_write_options(compression=COMPRESSION))
+
+
+def _dataset(path):
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def read_columns(path):
+    """Column names stored in a CSV file or Parquet dataset, without reading any rows."""
+    if file_format(path) == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    return [name for name in _dataset(path).schema.names if name != PARTITION_COLUMN]
+
+
+def read_frame(path, columns=None):
+    """Reads a CSV file or Parquet dataset, or just the given columns of it."""
+    if file_format(path) == "csv":
+        df = pd.read_csv(path, usecols=columns)
+    else:
+        df = _dataset(path).to_table(columns=columns or read_columns(path)).to_pandas()
+    if "timestamp" in df:
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+def iter_frames(path, chunksize):
+    """Reads a CSV file or Parquet dataset `chunksize` rows at a time, in file order."""
+    if file_format(path) == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+    for batch in _dataset(path).to_batches(columns=read_columns(path), batch_size=chunksize):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _user_ranges(dataset, chunksize):
+    """Exclusive upper user_id of consecutive ranges of about `chunksize` rows each; the last is None."""
+    counts = pd.Series(dtype=np.int64)
+    for batch in dataset.to_batches(columns=["user_id"], batch_size=ROW_GROUP_ROWS):
+        counts = counts.add(batch.column(0).to_pandas().value_counts(), fill_value=0)
+    counts = counts.sort_index()
+    range_of = ((counts.cumsum() - counts) // chunksize).to_numpy()  # by the rows before each user
+    return counts.index[np.flatnonzero(np.diff(range_of)) + 1].tolist() + [None]
+
+
+def iter_user_frames(path, chunksize):
+    """Reads a CSV file or Parquet dataset about `chunksize` rows at a time, in user_id, timestamp order.
+
+    A CSV file is read in file order, so it must be in that order already. A dataset
+    partitioned by date is not, but each of its files is in user_id order if the frame
+    written was (as the generators and detect_fraud.py write it). So every chunk takes
+    the next range of users from every file and sorts just those rows; a user's rows
+    are never split across chunks.
+    """
+    if file_format(path) == "csv":
+        yield from iter_frames(path, chunksize)
+        return
+    dataset = _dataset(path)
+    columns = read_columns(path)
+    fragments = list(dataset.get_fragments())
+    batch_rows = max(chunksize // max(len(fragments), 1), 1024)
+    readers = [fragment.to_batches(schema=dataset.schema, columns=columns, batch_size=batch_rows)
+               for fragment in fragments]
+    pending = [[] for _ in readers]  # rows read from each file that belong to later ranges
+    for end in _user_ranges(dataset, chunksize):
+        parts = []
+        for reader, tables in zip(readers, pending):
+            # Read on until the file reaches a user at or past the end of the range
+            while end is None or not tables or tables[-1].column("user_id")[-1].as_py() < end:
+                batch = next(reader, None)
+                if batch is None:
+                    break
+                if batch.num_rows:
+                    tables.append(pa.Table.from_batches([batch]))
+            if not tables:
+                continue
+            table = pa.concat_tables(tables)
+            split = len(table) if end is None else int(np.searchsorted(table.column("user_id").to_numpy(), end))
+            parts.append(table.slice(0, split))
+            tables[:] = [table.slice(split)] if split < len(table) else []
+        frame = pa.concat_tables(parts).to_pandas() if parts else None
+        if frame is not None and len(frame):
+            yield frame.sort_values(by=["user_id", "timestamp"], kind="stable", ignore_index=True)
+
+
+class _ParquetCsvStream(io.RawIOBase):
+    """A Parquet dataset as a read-only CSV byte stream (with header), converted batch by batch."""
+
+    def __init__(self, path):
+        self._columns = read_columns(path)
+        self._batches = _dataset(path).to_batches(columns=self._columns, batch_size=COPY_BATCH_ROWS)
+        self._buffer = bytearray((",".join(f'"{c}"' for c in self._columns) + "\n").encode())
+        self._options = pa_csv.WriteOptions(include_header=False)
+
+    def readable(self):
+        return True
+
+    def readinto(self, out):
+        while len(self._buffer) < len(out):
+            batch = next(self._batches, None)
+            if batch is None:
+                break
+            sink = io.BytesIO()
+            pa_csv.write_csv(batch, sink, self._options)
+            self._buffer += sink.getvalue()
+        n = min(len(out), len(self._buffer))
+        out[:n] = self._buffer[:n]
+        del self._buffer[:n]
+        return n
+
+
+def open_csv(path):
+    """A binary CSV stream (with header) of a CSV file or Parquet dataset, e.g. for COPY FROM STDIN."""
+    if file_format(path) == "csv":
+        return open(path, "rb")
+    return io.BufferedReader(_ParquetCsvStream(path), buffer_size=1 << 20)
@@ -0,0 +1,190 @@
+# scripts/realtime_scoring.py
+#
+# Scores transactions one at a time (or in small batches) as they arrive, using the
+# rules registered in detect_fraud.py and an in-memory store of each user's recent
+# activity instead of the database.
+
+import bisect
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from detect_fraud import FRAUD_SCORE_THRESHOLD, RULES, STATE_FILE, evaluate_rules, history_lookback, load_state
+from transaction_frame import CATEGORY_COLUMNS
+from user_profiles import PROFILES_FILE, UserProfiles
+
+MAX_USERS = 100_000  # users kept in memory before the least recently seen are evicted
+# Zone of the naive wall-clock timestamps the batch job scores (.env is loaded by pipeline_io)
+TRANSACTIONS_TIMEZONE = os.getenv("TRANSACTIONS_TIMEZONE", "Africa/Johannesburg")
+
+# Columns the built-in rules read; anything else on an incoming txn is passed through untouched,
+# unless a registered rule lists it in its `columns` (see rule_columns())
+SCORED_COLUMNS = ["user_id", "timestamp", "amount", "type", "location", "balance_before_txn"]
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _timestamp(value):
+    """A txn time as a naive pd.Timestamp, like the batch job's; aware times are converted to the local zone first."""
+    timestamp = pd.Timestamp(value)
+    return timestamp if timestamp.tzinfo is None else timestamp.tz_convert(TRANSACTIONS_TIMEZONE).tz_localize(None)
+
+
+class UserStateStore:
+    """Recent activity per user, evicting the least recently seen users past max_users.
+
+    For each user we keep the timestamps and locations of their txns inside the
+    longest rule lookback (New Location's 30 days, which covers Rapid Fire), plus
+    their balance after the latest txn.
+    """
+
+    def __init__(self, max_users=MAX_USERS):
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> {"times": [...], "locations": [...], "balance": float}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, user_id):
+        """The user's state, marking them as recently used, or None if not tracked."""
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is not None:
+                self._users.move_to_end(user_id)
+            return state
+
+    def record(self, user_id, timestamp, location, balance=None):
+        """Adds a txn to the user's history, dropping entries that fell out of the lookback."""
+        timestamp = _timestamp(timestamp)
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = {"times": [], "locations": [], "balance": None}
+            else:
+                self._users.move_to_end(user_id)
+
+            times, locations = state["times"], state["locations"]
+            at = bisect.bisect_right(times, timestamp)  # late arrivals keep the order
+            times.insert(at, timestamp)
+            locations.insert(at, location)
+            if at == len(times) - 1 and not _is_missing(balance):
+                state["balance"] = float(balance)
+
+            expired = bisect.bisect_left(times, times[-1] - history_lookback())
+            del times[:expired], locations[:expired]
+
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def load(self, frame):
+        """Seeds the store from flagged or raw transactions, e.g. the incremental state file."""
+        frame = frame.sort_values(by=["user_id", "timestamp"], kind="stable")
+        balances = frame["balance_after_txn"] if "balance_after_txn" in frame else [None] * len(frame)
+        for user_id, timestamp, location, balance in zip(frame["user_id"], frame["timestamp"],
+                                                         frame["location"], balances):
+            self.record(user_id, timestamp, location, balance)
+        return self
+
+    @classmethod
+    def from_state_file(cls, path=STATE_FILE, max_users=MAX_USERS, profiles_path=PROFILES_FILE):
+        """A store primed from detect_fraud.py's incremental state, or empty before the first run.
+
+        The state only holds each user's last few txns; the last use of every location
+        in the user profiles is added as a txn of its own, which is all New Location
+        needs from further back. Those are older than anything Rapid Fire still counts.
+        """
+        store = cls(max_users)
+        state = load_state(path)
+        if state is None:
+            return store
+        profiles = UserProfiles.load(profiles_path)
+        if profiles is not None:
+            seen = profiles.locations.rename("timestamp").reset_index()
+            held = seen.merge(state[["user_id", "timestamp", "location"]].drop_duplicates(), how="left",
+                              indicator=True)["_merge"] == "both"
+            state = pd.concat([seen[~held.to_numpy()], state], ignore_index=True)
+        return store.load(state)
+
+
+def rule_columns():
+    """SCORED_COLUMNS plus any other column a registered rule reads, e.g. a window rule over merchant."""
+    extra = [column for rule in RULES for column in rule.columns if column not in SCORED_COLUMNS]
+    return SCORED_COLUMNS + list(dict.fromkeys(extra))
+
+
+def _rule_frame(txns, store):
+    """The users' stored history plus the new txns, sorted by user_id, timestamp as in detect_fraud().
+
+    Built row by row in the compact layout the rules expect, since the frames are tiny
+    and pandas' per-call overhead would dominate. Returns the frame and the row position of every new txn.
+    """
+    by_user = {}
+    for txn in txns:
+        by_user.setdefault(txn["user_id"], []).append(txn)
+
+    read = rule_columns()
+    columns = {column: [] for column in read}
+    positions = {}
+    for user_id in sorted(by_user):
+        state = store.get(user_id) or {"times": [], "locations": [], "balance": None}
+        balance = state["balance"]
+        stored = [(t, None, {"user_id": user_id, "timestamp": t, "location": location})
+                  for t, location in zip(state["times"], state["locations"])]
+        new = [(txn["timestamp"], txn, txn) for txn in by_user[user_id]]
+        # sorted() is stable, so a new txn lands after stored txns with the same timestamp
+        for _, txn, row in sorted(stored + new, key=lambda entry: entry[0]):
+            if txn is not None:
+                if _is_missing(txn.get("balance_before_txn")):
+                    txn["balance_before_txn"] = balance
+                if not _is_missing(txn["balance_before_txn"]):
+                    balance = txn["balance_before_txn"] - txn["amount"]
+                positions[id(txn)] = len(columns["user_id"])
+            for column in read:
+                columns[column].append(row.get(column))
+
+    frame = pd.DataFrame({
+        "user_id": np.array(columns["user_id"]),
+        "timestamp": np.array([t.value for t in columns["timestamp"]], dtype="datetime64[ns]"),
+        "amount": np.array(columns["amount"], dtype=float),
+        "type": pd.Categorical(columns["type"]),
+        "location": pd.Categorical(columns["location"]),
+        "balance_before_txn": np.array(columns["balance_before_txn"], dtype=float),
+        "hour": np.array([t.hour for t in columns["timestamp"]]),
+    })
+    for column in read[len(SCORED_COLUMNS):]:
+        values = columns[column]
+        frame[column] = pd.Categorical(values) if column in CATEGORY_COLUMNS else np.array(values, dtype=float)
+    return frame, [positions[id(txn)] for txn in txns]
+
+
+def score_transactions(txns, store):
+    """Scores new txns (dicts with at least SCORED_COLUMNS) and records them in the store.
+
+    Runs the same registered rules as the batch job over each user's stored history
+    plus the new txns, so a txn gets the score detect_fraud() would give it at the time
+    it arrives. Rapid Fire can still flag a user's earlier txns later on; that only
+    shows up in the batch output. A missing balance_before_txn falls back to the
+    user's last known balance. Timestamps with a timezone are scored as
+    TRANSACTIONS_TIMEZONE wall-clock times, as the batch job sees them. Returns the
+    txns with rules_mask, fraud_score and is_fraud.
+    """
+    txns = [dict(txn, timestamp=_timestamp(txn["timestamp"])) for txn in txns]
+    frame, positions = _rule_frame(txns, store)
+    rules_mask, fraud_score = evaluate_rules(frame)
+
+    for txn, position in zip(txns, positions):
+        txn["rules_mask"] = int(rules_mask[position])
+        txn["fraud_score"] = int(fraud_score[position])
+        txn["is_fraud"] = int(txn["fraud_score"] >= FRAUD_SCORE_THRESHOLD)
+        balance = txn.get("balance_after_txn")
+        if _is_missing(balance) and not _is_missing(txn["balance_before_txn"]):
+            balance = txn["balance_before_txn"] - txn["amount"]
+        store.record(txn["user_id"], txn["timestamp"], txn["location"], balance)
+    return txns
@@ -0,0 +1,133 @@
+# scripts/refresh_summaries.py
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+import hashlib
+import os
+import time
+import urllib.parse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Load environment variables ---
+DB_USER = os.getenv("POSTGRES_USER", "postgres")
+DB_PASSWORD = urllib.parse.quote_plus(os.getenv("POSTGRES_PASSWORD", "Admin@1234"))
+DB_HOST = os.getenv("POSTGRES_HOST", "localhost")
+DB_PORT = os.getenv("POSTGRES_PORT", "5432")
+DB_NAME = os.getenv("POSTGRES_DB", "fnb_fraud_db")
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Risk score parameters, the formula the dashboard used to run client-side; served by /users/risk
+FRAUD_RATIO_WEIGHT = 75
+VOLUME_SPIKE_WEIGHT = 25
+VOLUME_SPIKE_MULTIPLIER = 4
+LOW_RISK_THRESHOLD = 30
+HIGH_RISK_THRESHOLD = 60
+
+MASK_BITS = 63  # rules_mask is a BIGINT; bits 0-62 keep it positive, whatever rules are registered
+
+# Materialized views behind the API's summary endpoints, each with the unique index
+# REFRESH ... CONCURRENTLY needs. A view whose definition changed is recreated.
+SUMMARY_VIEWS = {
+    "user_risk_summary": ("user_id", f"""
+        WITH per_user AS (
+            SELECT user_id,
+                   count(*) AS total_txns,
+                   count(*) FILTER (WHERE is_fraud = 1) AS fraud_txns,
+                   sum(amount) AS total_amount,
+                   coalesce(sum(amount) FILTER (WHERE is_fraud = 1), 0) AS fraud_amount,
+                   max(timestamp) AS last_txn_at
+            FROM transactions
+            GROUP BY user_id
+        ), baseline AS (
+            SELECT avg(total_txns) AS avg_txns_per_user FROM per_user
+        ), scored AS (
+            SELECT u.user_id, u.name,
+                   coalesce(p.total_txns, 0) AS total_txns,
+                   coalesce(p.fraud_txns, 0) AS fraud_txns,
+                   coalesce(p.total_amount, 0) AS total_amount,
+                   coalesce(p.fraud_amount, 0) AS fraud_amount,
+                   p.last_txn_at,
+                   coalesce(p.fraud_txns::float / p.total_txns, 0) AS fraud_ratio,
+                   coalesce(least(
+                       {FRAUD_RATIO_WEIGHT} * p.fraud_txns::float / p.total_txns
+                       + CASE WHEN p.total_txns > {VOLUME_SPIKE_MULTIPLIER} * b.avg_txns_per_user
+                              THEN {VOLUME_SPIKE_WEIGHT} ELSE 0 END,
+                       100), 0) AS raw_score
+            FROM users u
+            LEFT JOIN per_user p ON p.user_id = u.user_id
+            CROSS JOIN baseline b
+        )
+        SELECT user_id, name, total_txns, fraud_txns, total_amount, fraud_amount, last_txn_at, fraud_ratio,
+               round(raw_score::numeric)::int AS risk_score,
+               CASE WHEN raw_score > {HIGH_RISK_THRESHOLD} THEN 'High'
+                    WHEN raw_score > {LOW_RISK_THRESHOLD} THEN 'Medium'
+                    ELSE 'Low' END AS risk_level
+        FROM scored
+    """),
+    "fraud_by_rule": ("bit", f"""
+        SELECT bit,
+               count(*) AS hits,
+               count(*) FILTER (WHERE is_fraud = 1) AS fraud_txns
+        FROM transactions
+        CROSS JOIN generate_series(0, {MASK_BITS - 1}) AS bit
+        WHERE rules_mask <> 0 AND rules_mask & (1::bigint << bit) <> 0
+        GROUP BY bit
+    """),
+    "fraud_by_dimension": ("dimension, value", """
+        SELECT CASE WHEN grouping(channel) = 0 THEN 'channel'
+                    WHEN grouping(merchant) = 0 THEN 'merchant'
+                    ELSE 'location' END AS dimension,
+               coalesce(channel, merchant, location, 'Unknown') AS value,
+               count(*) AS total_txns,
+               count(*) FILTER (WHERE is_fraud = 1) AS fraud_txns,
+               coalesce(sum(amount) FILTER (WHERE is_fraud = 1), 0) AS fraud_amount
+        FROM transactions
+        GROUP BY GROUPING SETS ((channel), (merchant), (location))
+    """),
+    "fraud_daily": ("day", """
+        SELECT timestamp::date AS day,
+               count(*) AS total_txns,
+               count(*) FILTER (WHERE is_fraud = 1) AS fraud_txns,
+               coalesce(sum(amount) FILTER (WHERE is_fraud = 1), 0) AS fraud_amount
+        FROM transactions
+        GROUP BY 1
+    """),
+}
+
+
+def _definition_hash(key, query):
+    return hashlib.sha256(f"{key}\n{query}".encode()).hexdigest()
+
+
+def refresh_summaries(engine):
+    """Creates any missing or outdated summary view and refreshes the rest without blocking readers.
+
+    Each view's comment holds a hash of the definition it was created from, so editing
+    SUMMARY_VIEWS recreates that view on the next refresh.
+    """
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for view, (key, query) in SUMMARY_VIEWS.items():
+            definition = _definition_hash(key, query)
+            created = conn.execute(text("SELECT obj_description(to_regclass(:view), 'pg_class') AS definition "
+                                        "FROM pg_matviews WHERE matviewname = :view"), {"view": view}).first()
+            if created and created.definition == definition:
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+                continue
+            if created:
+                conn.execute(text(f"DROP MATERIALIZED VIEW {view}"))
+            conn.execute(text(f"CREATE MATERIALIZED VIEW {view} AS {query}"))
+            conn.execute(text(f"CREATE UNIQUE INDEX {view}_key ON {view} ({key})"))
+            conn.execute(text(f"COMMENT ON MATERIALIZED VIEW {view} IS '{definition}'"))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    try:
+        seconds = refresh_summaries(create_engine(DATABASE_URL))
+        print(f"📊 Refreshed fraud summaries in {seconds:.1f}s.")
+    except SQLAlchemyError as e:
+        print(f"❌ SQLAlchemy error: {e}")
@@ -0,0 +1,173 @@
+# scripts/user_profiles.py
+#
+# Rolling per-user profiles: how many txns a user made, the mean and variance of their
+# amounts, their latest txn and balance, and when they last used each location. Every
+# detection run folds its new txns into the saved profiles instead of rebuilding them
+# from the raw history, and the rules look a user's locations up by key instead of
+# re-scanning their last 30 days of rows. The loader copies the profiles file into the
+# user_profiles table, which the API serves at /users/{user_id}/profile.
+#
+#   profiles = UserProfiles.load()             # or UserProfiles.from_transactions(df)
+#   profiles.update(new_txns).save()
+#   profiles.location_last_seen(df["user_id"], df["location"])
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from pipeline_io import PROFILES, data_path, read_frame, write_frame
+
+PROFILES_FILE = data_path(PROFILES)
+
+AGGREGATES = ["txn_count", "amount_mean", "amount_m2", "last_timestamp", "balance"]
+
+# One row per user. amount_m2 is the sum of squared deviations from the mean (Welford),
+# so profiles merge exactly; the variance is amount_m2 / (txn_count - 1). locations maps
+# each location to when the user last used it.
+PROFILES_DDL = """
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id INTEGER PRIMARY KEY REFERENCES users (user_id) ON DELETE CASCADE,
+        txn_count INTEGER NOT NULL, amount_mean DOUBLE PRECISION, amount_m2 DOUBLE PRECISION,
+        last_timestamp TIMESTAMP, balance DOUBLE PRECISION, locations JSONB NOT NULL DEFAULT '{}')
+"""
+
+
+def ensure_profiles_table(conn):
+    conn.execute(text(PROFILES_DDL))
+
+
+def _summarize(txns):
+    """Profiles and location last-seen times of just these txns."""
+    txns = txns.sort_values(by=["user_id", "timestamp"], kind="stable")
+    grouped = txns.groupby("user_id", sort=True)
+    aggregates = pd.DataFrame({
+        "txn_count": grouped.size(),
+        "amount_mean": grouped["amount"].mean(),
+        "amount_m2": grouped["amount"].var(ddof=0) * grouped.size(),
+        "last_timestamp": grouped["timestamp"].max(),
+        "balance": grouped["balance_after_txn"].last() if "balance_after_txn" in txns else np.nan,
+    })
+    locations = pd.DataFrame({"user_id": txns["user_id"].to_numpy(),
+                              "location": np.asarray(txns["location"], dtype=object),
+                              "timestamp": txns["timestamp"].to_numpy()})
+    # Missing locations drop out of the groups, so they are never "known"
+    return aggregates, locations.groupby(["user_id", "location"])["timestamp"].max()
+
+
+class UserProfiles:
+    """Per-user aggregates, indexed by user_id, plus a (user_id, location) -> last seen index.
+
+    update() only summarizes the new txns; the summaries are merged into the profiles
+    once, the next time the aggregates or locations are read (or saved), so folding in
+    many small batches costs O(batch) each instead of O(users).
+    """
+
+    def __init__(self, aggregates=None, locations=None):
+        self._aggregates = aggregates if aggregates is not None else pd.DataFrame(
+            {column: [] for column in AGGREGATES}, index=pd.Index([], name="user_id"))
+        self._locations = locations if locations is not None else pd.Series(
+            [], dtype="datetime64[ns]", index=pd.MultiIndex.from_arrays([[], []], names=["user_id", "location"]))
+        self._pending = []  # (aggregates, locations) of batches not merged in yet, oldest first
+
+    def __len__(self):
+        return len(self.aggregates)
+
+    @classmethod
+    def from_transactions(cls, txns):
+        return cls(*_summarize(txns))
+
+    @property
+    def aggregates(self):
+        self._merge_pending()
+        return self._aggregates
+
+    @property
+    def locations(self):
+        self._merge_pending()
+        return self._locations
+
+    def update(self, txns):
+        """Folds txns newer than everything already in the profiles into them, in place."""
+        if len(txns):
+            self._pending.append(_summarize(txns))
+        return self
+
+    def _merge_pending(self):
+        """Merges the pending batches into the profiles in one grouped pass.
+
+        Counts add up, means and M2 merge with Chan et al.'s parallel formula, the
+        latest txn and each location's last-seen time take the later value, and the
+        balance comes from the newest batch that has one.
+        """
+        if not self._pending:
+            return
+        parts = [self._aggregates] + [aggregates for aggregates, _ in self._pending]
+        frame = pd.concat([part for part in parts if len(part)])
+        users = frame.groupby(level=0, sort=True)
+        count = users["txn_count"].sum()
+        mean = (frame["amount_mean"] * frame["txn_count"]).groupby(level=0, sort=True).sum() / count
+        deviation = frame["amount_mean"] - mean.reindex(frame.index).to_numpy()
+        aggregates = pd.DataFrame({
+            "txn_count": count.astype(np.int64),
+            "amount_mean": mean,
+            "amount_m2": (frame["amount_m2"] + frame["txn_count"] * deviation ** 2).groupby(level=0, sort=True).sum(),
+            "last_timestamp": users["last_timestamp"].max(),
+            "balance": users["balance"].last(),
+        })
+        locations = [part for part in [self._locations] + [locations for _, locations in self._pending] if len(part)]
+        if locations:
+            self._locations = pd.concat(locations).groupby(level=["user_id", "location"]).max()
+        self._aggregates = aggregates.rename_axis("user_id")
+        self._pending = []
+
+    def location_last_seen(self, users, locations):
+        """When each user last used each location, as far as the profiles know (NaT if never, or missing).
+
+        One hash lookup per row, however long the users' histories are.
+        """
+        keys = pd.MultiIndex.from_arrays([np.asarray(users), np.asarray(locations, dtype=object)])
+        return self.locations.reindex(keys).to_numpy(dtype="datetime64[ns]")
+
+    # --- Files ---
+    def to_frame(self):
+        """The profiles in the user_profiles table's layout, with locations as a JSON object per user."""
+        seen = self.locations  # sorted by user_id, so each user's entries are one run
+        names = seen.index.get_level_values("location")
+        escaped = pd.Series(names).map({name: json.dumps(name) for name in names.unique()}).to_numpy()
+        times = pd.DatetimeIndex(seen.to_numpy()).astype(str).to_numpy()
+        entries = (escaped + ': "' + times + '"').tolist()
+        users, starts = np.unique(seen.index.get_level_values("user_id"), return_index=True)
+        ends = np.append(starts[1:], len(entries))
+        locations = pd.Series(["{" + ", ".join(entries[start:end]) + "}" for start, end in zip(starts, ends)],
+                              index=users, dtype=object)
+
+        frame = self.aggregates.copy()
+        frame["locations"] = locations.reindex(frame.index).fillna("{}")
+        return frame.rename_axis("user_id").reset_index()
+
+    @classmethod
+    def from_frame(cls, frame):
+        frame = frame.set_index("user_id")
+        parsed = [json.loads(locations) for locations in frame["locations"]]
+        users = np.repeat(frame.index.to_numpy(), [len(seen) for seen in parsed])
+        names = [name for seen in parsed for name in seen]
+        times = pd.to_datetime([time for seen in parsed for time in seen.values()])
+        locations = pd.Series(times.to_numpy(dtype="datetime64[ns]"),
+                              index=pd.MultiIndex.from_arrays([users, names], names=["user_id", "location"]))
+        aggregates = frame[AGGREGATES].copy()
+        aggregates["last_timestamp"] = pd.to_datetime(aggregates["last_timestamp"])
+        return cls(aggregates, locations.sort_index())
+
+    def save(self, path=PROFILES_FILE):
+        write_frame(self.to_frame(), path)
+        return self
+
+    @classmethod
+    def load(cls, path=PROFILES_FILE):
+        """The saved profiles, or None if there are none yet."""
+        if not os.path.exists(path):
+            return None
+        return cls.from_frame(read_frame(path))
@@ -0,0 +1,213 @@
+# scripts/velocity.py
+#
+# Sliding-window ("velocity") features over each user's transactions: how many txns,
+# how much money, how many distinct merchants or locations, or the largest amount in
+# the last N minutes, hours or days before every txn. Windows are found with a binary
+# search inside each user's rows, so every feature is O(n log n) however long the
+# window is, and rules never loop over rows or groups.
+#
+#   index = WindowIndex.from_frame(df)  # df sorted by user_id, timestamp
+#   index.count(timedelta(minutes=5))
+#   index.sum(df["amount"], timedelta(hours=24))
+#   index.distinct(df["merchant"], timedelta(minutes=10))
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+STATS = ["count", "sum", "max", "distinct"]
+
+
+def _values(values):
+    """A column as a NumPy array; categoricals as their integer codes (-1 for missing)."""
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()
+    return np.asarray(values)
+
+
+def _codes(values):
+    """Integer codes for any column, -1 for missing values, so equal values have equal codes."""
+    values = _values(values)
+    if values.dtype.kind in "iub":
+        return values
+    return pd.factorize(values, use_na_sentinel=True)[0]
+
+
+def feature_name(stat, column, window):
+    """Column name of a feature in window_features(), e.g. amount_sum_1h or count_5m."""
+    seconds = int(pd.Timedelta(window).total_seconds())
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds and seconds % size == 0:
+            length = f"{seconds // size}{unit}"
+            break
+    else:
+        length = f"{seconds}s"
+    return "_".join(part for part in (column, stat, length) if part)
+
+
+class WindowIndex:
+    """Per-user sliding windows over rows sorted by user_id, timestamp.
+
+    The window of a row holds the rows of the same user from `window` before its
+    timestamp up to and including the row itself; later rows with the same timestamp
+    are not in it. Window starts are computed once per window length and reused by
+    every feature over that length.
+    """
+
+    def __init__(self, users, times):
+        self.users = np.asarray(users)
+        self.times = np.asarray(times)
+        self.n = len(self.times)
+        self.rows = np.arange(self.n)
+        new_user = np.ones(self.n, dtype=bool)
+        new_user[1:] = self.users[1:] != self.users[:-1]
+        self.user_start = np.maximum.accumulate(np.where(new_user, self.rows, 0))
+        self._starts = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df["user_id"].to_numpy(), df["timestamp"].to_numpy())
+
+    def start(self, window):
+        """First row of each row's window.
+
+        A vectorized binary search over each user's rows, run for every row at once:
+        about log2(most txns of one user) passes over the rows still searching.
+        """
+        window = np.timedelta64(pd.Timedelta(window).to_timedelta64())
+        if window in self._starts:
+            return self._starts[window]
+
+        target = self.times - window
+        lo, hi = self.user_start.copy(), self.rows.copy()
+        searching = np.nonzero(lo < hi)[0]
+        while len(searching):
+            mid = (lo[searching] + hi[searching]) // 2
+            before = self.times[mid] < target[searching]
+            lo[searching] = np.where(before, mid + 1, lo[searching])
+            hi[searching] = np.where(before, hi[searching], mid)
+            searching = searching[lo[searching] < hi[searching]]
+
+        self._starts[window] = lo
+        return lo
+
+    def count(self, window):
+        """Txns in each row's window, the row included."""
+        return self.rows - self.start(window) + 1
+
+    def sum(self, values, window):
+        """Sum of `values` over each row's window; missing values count as 0."""
+        values = _values(values)
+        if values.dtype.kind == "f":
+            values = np.nan_to_num(values)
+        totals = np.concatenate([[0], np.cumsum(values)])
+        return totals[self.rows + 1] - totals[self.start(window)]
+
+    def max(self, values, window):
+        """Largest of `values` over each row's window, ignoring missing values.
+
+        Uses a sparse table of maxima over 2^k rows, built only up to the longest window
+        actually seen, so each row's answer is the larger of two overlapping blocks.
+        """
+        values = _values(values)
+        start = self.start(window)
+        length = self.rows - start + 1
+        if self.n == 0:
+            return values.copy()
+        levels = [values]
+        while 1 << len(levels) <= length.max():
+            half = 1 << (len(levels) - 1)
+            previous = levels[-1]
+            level = previous.copy()
+            level[:-half] = np.fmax(previous[:-half], previous[half:])
+            levels.append(level)
+        table = np.stack(levels)
+        k = np.log2(length).astype(int)  # exact for the small integers window lengths are
+        return np.fmax(table[k, start], table[k, self.rows - (1 << k) + 1])
+
+    def distinct(self, values, window):
+        """Distinct values (ignoring missing ones) over each row's window.
+
+        Row j adds one distinct value to every window that contains j but not the
+        previous row with the same user and value. Window starts never decrease, so
+        those windows are one contiguous run of rows, found with searchsorted, and
+        the counts are a running sum of +1/-1 at the ends of the runs.
+        """
+        codes = _codes(values)
+        start = self.start(window)
+        previous = self._previous_same(codes)
+
+        first = np.maximum(self.rows, np.searchsorted(start, previous, side="right"))
+        last = np.searchsorted(start, self.rows, side="right") - 1
+        counted = (codes >= 0) & (first <= last)
+        changes = (np.bincount(first[counted], minlength=self.n + 1)
+                   - np.bincount(last[counted] + 1, minlength=self.n + 1))
+        return np.cumsum(changes[:-1])
+
+    def last_seen(self, values):
+        """When the user last had the row's value at an earlier timestamp (NaT if never, or missing)."""
+        codes = _codes(values)
+        order = np.lexsort((self.rows, codes, self.users))
+        users, codes_sorted, times = self.users[order], codes[order], self.times[order]
+
+        same_pair = np.zeros(self.n, dtype=bool)
+        same_pair[1:] = (users[1:] == users[:-1]) & (codes_sorted[1:] == codes_sorted[:-1]) & (codes_sorted[1:] >= 0)
+        same_time = np.zeros(self.n, dtype=bool)
+        same_time[1:] = same_pair[1:] & (times[1:] == times[:-1])
+
+        # Rows sharing a timestamp all take the value of the first row in their tie run
+        seen = np.full(self.n, np.datetime64("NaT"), dtype=times.dtype)
+        seen[1:] = np.where(same_pair[1:], times[:-1], np.datetime64("NaT"))
+        run_start = np.maximum.accumulate(np.where(same_time, 0, self.rows))
+        seen = seen[run_start]
+
+        last = np.empty_like(seen)
+        last[order] = seen
+        return last
+
+    def _previous_same(self, codes):
+        """Row of the user's previous txn with the same value, or -1."""
+        order = np.lexsort((self.rows, codes, self.users))
+        previous = np.full(self.n, -1)
+        same = np.zeros(self.n, dtype=bool)
+        same[1:] = (self.users[order][1:] == self.users[order][:-1]) & (codes[order][1:] == codes[order][:-1])
+        previous[order[1:][same[1:]]] = order[:-1][same[1:]]
+        return previous
+
+    def feature(self, stat, window, values=None):
+        """One of STATS over `window`; every stat but count needs `values`."""
+        if stat not in STATS:
+            raise ValueError(f"Unknown window statistic {stat!r}; expected one of {STATS}.")
+        if stat == "count":
+            return self.count(window)
+        return getattr(self, stat)(values, window)
+
+
+def window_features(df, specs):
+    """Computes many window features of df (sorted by user_id, timestamp) in one pass.
+
+    `specs` is a list of (stat, column, window), with column None for count. Each window
+    length is searched once, whatever the number of features over it. Returns a frame
+    aligned with df, with columns named by feature_name().
+    """
+    index = window_index(df)
+    return pd.DataFrame({
+        feature_name(stat, column, window): index.feature(stat, window, None if column is None else df[column])
+        for stat, column, window in specs
+    }, index=df.index)
+
+
+_indexes = {}  # id(frame) -> WindowIndex, dropped when the frame is garbage collected
+
+
+def window_index(df):
+    """The WindowIndex of df (sorted by user_id, timestamp), shared by every rule run on that frame.
+
+    Cached per frame object, so do not reorder a frame in place after its rules have run.
+    """
+    index = _indexes.get(id(df))
+    if index is None or index.n != len(df):
+        index = _indexes[id(df)] = WindowIndex.from_frame(df)
+        weakref.finalize(df, _indexes.pop, id(df), None)
+    return index
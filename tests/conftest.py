@@ -0,0 +1,9 @@
+# tests/conftest.py
+#
+# The stage modules import each other by bare name, as when they run from scripts/.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "scripts"), ROOT]
@@ -0,0 +1,53 @@
+# tests/test_export.py
+#
+# Needs the PostgreSQL database from .env with the transactions loaded; skipped otherwise.
+
+import anyio
+import pytest
+from sqlalchemy import text
+
+import main
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    try:
+        with main.engine.connect() as conn:
+            rows = conn.execute(text("SELECT count(*) FROM transactions")).scalar()
+    except Exception as e:
+        pytest.skip(f"database not available: {e}")
+    if not rows:
+        pytest.skip("no transactions loaded")
+
+
+async def _abort_download(spec_version):
+    """Requests a CSV export and drops the connection as soon as the first body chunk arrives."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/transactions/export", "raw_path": b"/transactions/export",
+        "query_string": b"format=csv", "root_path": "", "headers": [], "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    gone = anyio.Event()
+
+    async def receive():
+        if not gone.is_set():
+            await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            gone.set()
+            if spec_version == "2.4":  # servers on 2.4 report a disconnect as a failed send
+                raise OSError("client disconnected")
+
+    try:
+        await main.app(scope, receive, send)
+    except Exception:
+        pass
+    return main.engine.pool.checkedout()
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_aborted_export_returns_its_connection(spec_version):
+    assert anyio.run(_abort_download, spec_version) == 0
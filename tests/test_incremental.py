@@ -0,0 +1,75 @@
+# tests/test_incremental.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from detect_fraud import RAPID_FIRE_WINDOW, detect_fraud, detect_fraud_incremental
+from user_profiles import UserProfiles
+
+
+@pytest.fixture(scope="module")
+def txns():
+    # Dense enough that Rapid Fire and New Location fire across the cut between runs
+    rng = np.random.default_rng(0)
+    n = 1500
+    users, seconds = rng.integers(1, 40, n), rng.integers(0, 10 * 86400, n)
+    # A third of the txns follow an earlier one by the same user within two minutes, some tied
+    burst, follows = np.arange(1000, n), rng.integers(0, 1000, n - 1000)
+    users[burst], seconds[burst] = users[follows], seconds[follows] + rng.integers(0, 120, n - 1000)
+    balance = rng.uniform(-1000, 60_000, n).round(2)
+    amount = rng.uniform(10, 150_000, n).round(2)
+    txns = pd.DataFrame({
+        "transaction_id": np.arange(n) + 1,
+        "user_id": users,
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(seconds, unit="s"),
+        "amount": amount,
+        "type": rng.choice(np.array(["Purchase", "Withdrawal", "Transfer", "Deposit"], dtype=object), n),
+        "channel": rng.choice(np.array(["POS", "ATM", "Online", "App"], dtype=object), n),
+        "location": rng.choice(np.array(["Rosebank, GP", "Mowbray, WC", "Umhlanga, KZN", None], dtype=object), n,
+                               p=[0.4, 0.3, 0.27, 0.03]),
+        "merchant": rng.choice(np.array(["Shoprite", "KFC", "FNB ATM"], dtype=object), n),
+        "balance_before_txn": balance,
+        "balance_after_txn": balance - amount,
+    })
+    return txns.sort_values(["timestamp", "transaction_id"], ignore_index=True)
+
+
+def _by_id(df):
+    df = df.sort_values("transaction_id", ignore_index=True)
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def _burst_watermark(txns):
+    """The time of a txn with the user's previous and next txns within Rapid Fire's window, the next
+    one strictly later, so the first run sees two txns of the burst and the second run the third."""
+    by_user = txns.sort_values(["user_id", "timestamp"], kind="stable")
+    users, times = by_user["user_id"], by_user["timestamp"]
+    inside = ((users == users.shift()) & (users == users.shift(-1)) & (times.shift(-1) > times)
+              & (times.shift(-1) - times.shift() <= RAPID_FIRE_WINDOW))
+    return times[inside].iloc[inside.sum() // 2]
+
+
+def _assert_two_runs_match_batch(tmp_path, txns, watermark):
+    state, profiles = str(tmp_path / "state.csv"), str(tmp_path / "profiles.parquet")
+
+    first = detect_fraud_incremental(txns[txns["timestamp"] <= watermark].copy(), state, profiles)
+    second = detect_fraud_incremental(txns.copy(), state, profiles)
+
+    # The loader upserts by transaction_id, so the second run's re-scored rows win
+    upserted = pd.concat([first, second]).drop_duplicates("transaction_id", keep="last")
+    expected = _by_id(detect_fraud(txns.copy()))
+    pd.testing.assert_frame_equal(_by_id(upserted)[expected.columns], expected, check_dtype=False)
+
+    full = UserProfiles.from_transactions(txns)
+    pd.testing.assert_frame_equal(UserProfiles.load(profiles).aggregates, full.aggregates,
+                                  check_dtype=False, check_index_type=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("cut", [0.1, 0.5, 0.97])
+def test_two_incremental_runs_match_one_batch_run(tmp_path, txns, cut):
+    _assert_two_runs_match_batch(tmp_path, txns, txns["timestamp"].iloc[int(len(txns) * cut)])
+
+
+def test_a_burst_split_across_runs_matches_one_batch_run(tmp_path, txns):
+    _assert_two_runs_match_batch(tmp_path, txns, _burst_watermark(txns))
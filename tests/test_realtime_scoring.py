@@ -0,0 +1,26 @@
+# tests/test_realtime_scoring.py
+
+import pandas as pd
+
+from detect_fraud import RULES, detect_fraud
+from realtime_scoring import TRANSACTIONS_TIMEZONE, UserStateStore, score_transactions
+
+# Around Odd Hours' boundaries once converted to the local zone, but not in UTC
+AWARE_TIMES = ["2025-01-01T05:00:00+02:00", "2025-01-02T01:30:00+00:00", "2025-01-02T23:30:00-05:00",
+               "2025-01-04T02:10:00+02:00", "2025-01-05T03:59:00+03:00"]
+
+
+def test_offset_timestamps_score_as_in_batch():
+    txns = [{"transaction_id": i, "user_id": 1, "timestamp": timestamp, "amount": 100.0, "type": "Purchase",
+             "location": "Durban", "balance_before_txn": 5000.0 - 100 * i}
+            for i, timestamp in enumerate(AWARE_TIMES)]
+    store = UserStateStore()
+    online = [score_transactions([txn], store)[0] for txn in txns]
+
+    local = [pd.Timestamp(t).tz_convert(TRANSACTIONS_TIMEZONE).tz_localize(None) for t in AWARE_TIMES]
+    batch = detect_fraud(pd.DataFrame(txns).assign(timestamp=local)).sort_values("transaction_id")
+
+    assert [txn["rules_mask"] for txn in online] == batch["rules_mask"].tolist()
+    assert [txn["is_fraud"] for txn in online] == batch["is_fraud"].tolist()
+    odd_hours = next(rule.bit for rule in RULES if rule.name == "Odd Hours")
+    assert (batch["rules_mask"].to_numpy() >> odd_hours & 1).tolist() == [0, 1, 0, 1, 1]
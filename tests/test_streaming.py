@@ -0,0 +1,48 @@
+# tests/test_streaming.py
+
+import pandas as pd
+import pytest
+
+from detect_fraud import detect_fraud, detect_fraud_streaming
+from generate_transactions import generate_transactions
+from generate_users import generate_users
+from pipeline_io import TRANSACTIONS, data_path, read_frame
+
+
+def _by_id(df):
+    df = df.sort_values("transaction_id", ignore_index=True)
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+@pytest.mark.parametrize("chunksize", [1, 37, 10_000])
+def test_streaming_matches_in_memory_on_generated_data(tmp_path, monkeypatch, chunksize):
+    # The generators' default output: a Parquet dataset partitioned by date, not in user order
+    monkeypatch.chdir(tmp_path)
+    generate_transactions(users_df=generate_users(n=20))
+    path = data_path(TRANSACTIONS)
+    expected = _by_id(detect_fraud(read_frame(path)))
+
+    rows = detect_fraud_streaming(path, "streamed.parquet", chunksize, "profiles.parquet")
+
+    assert rows == len(expected)
+    pd.testing.assert_frame_equal(_by_id(read_frame("streamed.parquet"))[expected.columns], expected,
+                                  check_dtype=False)
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_streaming_joins_all_na_held_rows_without_warning(tmp_path):
+    # Odd users have no channel or merchant, so the rows held across a chunk boundary read as all-NaN
+    txns = pd.DataFrame([
+        {"transaction_id": user * 10 + i, "user_id": user, "timestamp": f"2025-01-0{i + 1} 10:00:00",
+         "amount": 100.0, "type": "Purchase", "channel": None if user % 2 else "POS", "location": "Durban",
+         "merchant": None if user % 2 else "Shop", "balance_before_txn": 1000.0, "balance_after_txn": 900.0}
+        for user in range(1, 5) for i in range(6)
+    ])
+    txns.to_csv(tmp_path / "input.csv", index=False)
+    expected = _by_id(detect_fraud(read_frame(str(tmp_path / "input.csv"))))
+
+    detect_fraud_streaming(str(tmp_path / "input.csv"), str(tmp_path / "streamed.parquet"), 4,
+                           str(tmp_path / "profiles.parquet"))
+
+    pd.testing.assert_frame_equal(_by_id(read_frame(str(tmp_path / "streamed.parquet")))[expected.columns],
+                                  expected, check_dtype=False)
@@ -0,0 +1,63 @@
+# tests/test_user_profiles.py
+
+import numpy as np
+import pandas as pd
+
+from user_profiles import UserProfiles
+
+LOCATIONS = ["Durban", "Cape Town", "Soweto", None]
+
+
+def _txns(seed, n=400):
+    rng = np.random.default_rng(seed)
+    txns = pd.DataFrame({
+        "user_id": rng.integers(1, 30, n),
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit="s"),
+        "amount": rng.lognormal(6, 1.5, n).round(2),
+        "location": rng.choice(np.array(LOCATIONS, dtype=object), n),
+        "balance_after_txn": rng.uniform(-1000, 50_000, n).round(2),
+    })
+    return txns.sort_values(["timestamp", "user_id"], ignore_index=True)
+
+
+def test_merged_batches_match_the_full_history():
+    txns = _txns(0)
+    # Uneven batches, so users appear in some batches and not others
+    batches = [txns.iloc[start:end] for start, end in [(0, 5), (5, 130), (130, 131), (131, 320), (320, None)]]
+
+    merged = UserProfiles.from_transactions(batches[0])
+    for batch in batches[1:]:
+        merged.update(batch)
+    full = UserProfiles.from_transactions(txns)
+
+    pd.testing.assert_frame_equal(merged.aggregates, full.aggregates, check_dtype=False, rtol=1e-9)
+    pd.testing.assert_series_equal(merged.locations, full.locations)
+
+
+def test_merging_twice_keeps_the_exact_statistics():
+    txns = _txns(1)
+    profiles = UserProfiles.from_transactions(txns.iloc[:100])
+    profiles.update(txns.iloc[100:250])
+    profiles.aggregates  # merges, so the next update merges into already merged profiles
+    profiles.update(txns.iloc[250:])
+
+    by_user = txns.groupby("user_id")["amount"]
+    aggregates = profiles.aggregates
+    np.testing.assert_array_equal(aggregates["txn_count"], by_user.size())
+    np.testing.assert_allclose(aggregates["amount_mean"], by_user.mean(), rtol=1e-12)
+    # The variance of a user with one txn is undefined, as in pandas
+    np.testing.assert_allclose(aggregates["amount_m2"] / (aggregates["txn_count"] - 1), by_user.var(), rtol=1e-9)
+    assert (aggregates["last_timestamp"] == txns.groupby("user_id")["timestamp"].max()).all()
+    assert (aggregates["balance"] == txns.groupby("user_id")["balance_after_txn"].last()).all()
+
+
+def test_saved_profiles_merge_like_fresh_ones(tmp_path):
+    txns = _txns(2)
+    UserProfiles.from_transactions(txns.iloc[:200]).save(str(tmp_path / "profiles.parquet"))
+
+    merged = UserProfiles.load(str(tmp_path / "profiles.parquet")).update(txns.iloc[200:])
+    full = UserProfiles.from_transactions(txns)
+
+    pd.testing.assert_frame_equal(merged.aggregates, full.aggregates, check_dtype=False, rtol=1e-9)
+    pd.testing.assert_series_equal(merged.locations, full.locations, check_index_type=False,
+                                   check_names=False)
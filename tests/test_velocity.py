@@ -0,0 +1,63 @@
+# tests/test_velocity.py
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from velocity import WindowIndex
+
+WINDOWS = [timedelta(0), timedelta(minutes=5), timedelta(hours=1), timedelta(days=1), timedelta(days=30)]
+
+
+@pytest.fixture(scope="module")
+def txns():
+    rng = np.random.default_rng(0)
+    n = 600
+    # Minutes apart, with many exact ties, so windows end up short, long and tied
+    txns = pd.DataFrame({
+        "user_id": rng.integers(1, 12, n),
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 400, n) * 7, unit="min"),
+        "amount": np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(6, 1.5, n).round(2)),
+        "merchant": rng.choice(np.array(["Checkers", "Takealot", "Engen", None], dtype=object), n),
+    })
+    txns = txns.sort_values(["user_id", "timestamp"], kind="stable", ignore_index=True)
+    txns["location"] = txns["merchant"].astype("category")  # categoricals go through their codes
+    return txns
+
+
+def _naive_windows(txns, window):
+    """Row numbers in each row's window, by checking every earlier row of the user."""
+    users, times = txns["user_id"].to_numpy(), txns["timestamp"].to_numpy()
+    window = np.timedelta64(pd.Timedelta(window).to_timedelta64())
+    return [[j for j in range(i + 1) if users[j] == users[i] and times[j] >= times[i] - window]
+            for i in range(len(txns))]
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_window_stats_match_a_naive_loop(txns, window):
+    index = WindowIndex.from_frame(txns)
+    amounts, merchants = txns["amount"].to_numpy(), txns["merchant"].to_numpy()
+    rows = _naive_windows(txns, window)
+
+    np.testing.assert_array_equal(index.count(window), [len(r) for r in rows])
+    np.testing.assert_allclose(index.sum(txns["amount"], window), [np.nansum(amounts[r]) for r in rows])
+    np.testing.assert_array_equal(index.max(txns["amount"], window),
+                                  [np.nan if np.isnan(amounts[r]).all() else np.nanmax(amounts[r]) for r in rows])
+    distinct = [len({m for m in merchants[r] if m is not None}) for r in rows]
+    np.testing.assert_array_equal(index.distinct(txns["merchant"], window), distinct)
+    np.testing.assert_array_equal(index.distinct(txns["location"], window), distinct)
+
+
+def test_last_seen_matches_a_naive_loop(txns):
+    users, times, merchants = txns["user_id"].to_numpy(), txns["timestamp"].to_numpy(), txns["merchant"].to_numpy()
+    expected = []
+    for i in range(len(txns)):
+        seen = [times[j] for j in range(len(txns))
+                if users[j] == users[i] and merchants[i] is not None and merchants[j] == merchants[i]
+                and times[j] < times[i]]
+        expected.append(max(seen) if seen else np.datetime64("NaT"))
+
+    np.testing.assert_array_equal(WindowIndex.from_frame(txns).last_seen(txns["merchant"]),
+                                  np.array(expected, dtype="datetime64[ns]"))